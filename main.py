@@ -8,9 +8,9 @@ import sys
 import subprocess
 import platform
 import shutil
-from concurrent.futures import ThreadPoolExecutor
+import threading
 from importlib.machinery import EXTENSION_SUFFIXES
-from itertools import permutations, repeat
+from itertools import permutations
 
 from textual.app import App, ComposeResult
 from textual.containers import Horizontal
@@ -46,6 +46,7 @@ def _cython_built() -> bool:
         if built_path is None:
             return False
         source_paths = [SRC_DIR / f"{name}.pyx", SRC_DIR / f"{name}.pxd", SRC_DIR / f"{name}.py"]
+        source_paths += list(SRC_DIR.glob("*.pxi"))  # shared kernel includes
         if built_path.stat().st_mtime < _latest_mtime(source_paths):
             return False
     return True
@@ -91,30 +92,42 @@ def _ensure_cython_built() -> None:
     if _cython_built():
         return
     _ensure_macos_prereqs()
-    subprocess.run(
-        [sys.executable, "setup.py", "build_ext", "--inplace"],
-        cwd=str(SRC_DIR),
-        check=True,
-    )
+    try:
+        subprocess.run(
+            [sys.executable, "setup.py", "build_ext", "--inplace"],
+            cwd=str(SRC_DIR),
+            check=True,
+        )
+    except (subprocess.CalledProcessError, OSError) as e:
+        # every compiled module has a pure Python/NumPy fallback (src/parser.py, src/npmatch.py), so keep going
+        print(f"Building the Cython extensions failed ({e}); running without them, scoring is slower.", file=sys.stderr)
 
 
 _ensure_cython_built()
 
+import numpy as np
 from src.decks import Deck, deck_gen
 from src import saving
-from src.parser import Parser
-from src.heatmaps import make_heatmap
+from src.parser import Parser, score_counts_both
+from src.heatmaps import make_heatmap, text_heatmap
 from src.scores import ScoreTable, load_table
-try:
-    from src.fastmatch_simd import winner_counts_for_pair
-except Exception:
-    from src.fastmatch import winner_counts_for_pair
+from src.results import ResultStore, score_results_both
+from src.variance import variance_from_stats
 
 FIGURES_DIR = BASE_DIR / "figures"
 DATA_DIR = BASE_DIR / "data"
 
 _SCORE_CACHE_VERSION = 2
 
+# keep per-deck, per-pair outcomes next to the deck chunks for post-hoc queries (see src/results.py)
+RECORD_DECK_RESULTS = False
+_RESULT_CHUNK = 1 << 16  # most decks scored per result chunk (~95MB of outcomes and margins at 4 bits)
+
+# during chunked generation, redraw the text win-rate grid at most this often (seconds)
+LIVE_VIEW_SECONDS = 2.0
+# also re-render the heatmap PNGs this often during long runs, 0 turns it off (rendering takes a few seconds)
+LIVE_HEATMAP_SECONDS = 0
+
 
 def _score_cache_tag(by_tricks: bool) -> str:
     return "tricks" if by_tricks else "cards"
@@ -128,32 +141,39 @@ def _score_cache_meta_path(deck_folder: Path, bits: int, by_tricks: bool) -> Pat
     return deck_folder / f"scores_bits{bits}_{_score_cache_tag(by_tricks)}.meta.json"
 
 
+def _score_cache_npy_path(deck_folder: Path, bits: int, by_tricks: bool) -> Path:
+    return deck_folder / f"scores_bits{bits}_{_score_cache_tag(by_tricks)}.npy"
+
+
 def _pair_options(bits: int) -> list[tuple[str, str]]:
     player_options = [str(bin(w))[2:].zfill(bits) for w in range(2**bits)]
     return list(permutations(player_options, 2))
 
 
-def _score_workers(pair_count: int) -> int:
-    return max(1, min(pair_count, os.cpu_count() or 1))
+def _score_workers() -> int:
+    # pairs and deck ranges are both split across threads, so every core can be used
+    return max(1, os.cpu_count() or 1)
 
 
-def _score_pair_rows(
-    decks_bytes: list[bytes], score_by_tricks: bool, pair: tuple[str, str]
-) -> list[int | str]:
-    p1, p2 = pair
-    counts = winner_counts_for_pair(decks_bytes, p1, p2, aligned=False, score_by_tricks=score_by_tricks)
-    return [p1, p2, int(counts[0]), int(counts[1]), int(counts[2])]
+def _score_rows_both(decks: Deck, bits: int) -> tuple[list[list[int | str]], list[list[int | str]]]:
+    """Score rows by tricks and by cards from one pass of next-occurrence tables"""
+    pairs = _pair_options(bits)
+    counts = score_counts_both(decks.array, pairs, workers=_score_workers())
+    return tuple(
+        [[p1, p2, int(w), int(l), int(t)] for (p1, p2), (w, l, t) in zip(pairs, method_counts.tolist())]
+        for method_counts in counts
+    )
 
 
-def _score_rows_parallel(decks: list[str], bits: int, score_by_tricks: bool) -> list[list[int | str]]:
-    decks_bytes = [deck.encode("ascii") for deck in decks]
-    pairs = _pair_options(bits)
-    workers = _score_workers(len(pairs))
-    if workers == 1:
-        return [_score_pair_rows(decks_bytes, score_by_tricks, pair) for pair in pairs]
+def _score_table(scores: list, by_tricks: bool) -> ScoreTable:
+    """Score rows with the variance of every chance; the TUI only generates plain shuffles, so it is the iid one"""
+    counts = np.array([row[2:5] for row in scores], dtype=np.int64).reshape(-1, 3)
+    return ScoreTable(scores, scoring_by_tricks=by_tricks, variance=variance_from_stats(counts[:, None, :], "iid"))
 
-    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="penney-score") as executor:
-        return list(executor.map(_score_pair_rows, repeat(decks_bytes), repeat(score_by_tricks), pairs))
+
+def _win_stderr(scores: list, by_tricks: bool) -> np.ndarray:
+    """Standard error of every row's win chance, for the heatmap error bars"""
+    return _score_table(scores, by_tricks).std_error()[:, 0]
 
 
 def _merge_score_rows(current_scores: list, additional_scores: list) -> list:
@@ -198,7 +218,8 @@ def _load_score_cache(deck_folder: Path, bits: int, by_tricks: bool, deck_count:
         table = load_table(csv_path, scoring_by_tricks=by_tricks)
     except Exception:
         return None
-    return table.raw.values.tolist()
+    # the cache also holds variance columns, score rows are only the choices and counts
+    return table.raw[["p1choice", "p2choice", "win", "loss", "tie"]].values.tolist()
 
 
 def _save_score_cache(deck_folder: Path, bits: int, by_tricks: bool, scores: list, deck_count: int) -> None:
@@ -206,7 +227,12 @@ def _save_score_cache(deck_folder: Path, bits: int, by_tricks: bool, scores: lis
     csv_path = _score_cache_csv_path(deck_folder, bits, by_tricks)
     meta_path = _score_cache_meta_path(deck_folder, bits, by_tricks)
 
-    ScoreTable(scores, scoring_by_tricks=by_tricks).save(csv_path)
+    _score_table(scores, by_tricks).save(csv_path)
+    # memory-mappable copy of the counts for src/service.py, swapped in atomically so readers never see half a file
+    npy_path = _score_cache_npy_path(deck_folder, bits, by_tricks)
+    tmp_path = npy_path.with_suffix(".tmp.npy")
+    np.save(tmp_path, np.array([row[2:5] for row in scores], dtype=np.int64))
+    os.replace(tmp_path, npy_path)
     meta = {
         "version": _SCORE_CACHE_VERSION,
         "bits": bits,
@@ -217,6 +243,35 @@ def _save_score_cache(deck_folder: Path, bits: int, by_tricks: bool, scores: lis
     meta_path.write_text(json.dumps(meta, indent=2, sort_keys=True) + "\n")
 
 
+def _record_deck_results(deck_folder: Path, bits: int, decks: Deck) -> str | None:
+    """
+    Bring the per-deck result stores of `deck_folder` up to date with `decks`, every deck saved there.
+
+    Decks a store is missing (the ones just generated, or every earlier one for a folder made before
+    recording was on) are scored by tricks and by cards in one table pass. Returns a warning when a
+    store holds more decks than the folder, since its rows no longer line up with the decks.
+    """
+    if not RECORD_DECK_RESULTS:
+        return None
+    stores = [ResultStore(deck_folder, bits, scoring_by_tricks=by_tricks) for by_tricks in (True, False)]
+    lengths = [len(store) for store in stores]
+    if max(lengths) > len(decks):
+        return (
+            f"Per-deck results in {deck_folder.name} cover {max(lengths)} decks but the folder holds {len(decks)}; "
+            f"delete its results_bits{bits}_* folders to rebuild them."
+        )
+    cards = decks.array
+    for start in range(min(lengths), len(decks), _RESULT_CHUNK):
+        stop = min(start + _RESULT_CHUNK, len(decks))
+        results = score_results_both(cards[start:stop], bits, workers=_score_workers())
+        for store, length, (outcomes, margins) in zip(stores, lengths, results):
+            if length <= start:
+                store.append_arrays(outcomes, margins, decks.deck_size)
+            elif length < stop:
+                store.append_arrays(outcomes[:, length - start :], margins[:, length - start :], decks.deck_size)
+    return None
+
+
 def _list_saved_deck_dirs() -> list[Path]:
     DATA_DIR.mkdir(parents=True, exist_ok=True)
     deck_dirs = []
@@ -292,6 +347,10 @@ class PenneyApp(App):
                     yield Label("Additional decks:")
                     yield Input(placeholder="e.g. 10000", id="deck-count", restrict=r"[0-9]*")
                     yield Button("Run Update", id="run")
+                    # only runs of 100000+ decks are generated in chunks, so only they can stop early
+                    yield Button(
+                        "Stop Early", id="stop", disabled=True, tooltip="Available while 100000+ decks generate in chunks"
+                    )
             with TabPane("Bit Selection", id="tab-bits"):
                 with Horizontal(id="bits-row"):
                     yield Label("Bits:")
@@ -362,10 +421,17 @@ class PenneyApp(App):
             return
         bits = int(bits_raw)
         self._set_status("Starting update...")
+        self._stop_requested.clear()
         self.run_worker(
             lambda: self._update_data_and_figures(additional, bits, deck_value), thread=True, exclusive=True
         )
 
+    def _set_stop_enabled(self, enabled: bool) -> None:
+        self.query_one("#stop", Button).disabled = not enabled
+
+    def _show_live_scores(self, text: str) -> None:
+        self.query_one("#output", Static).update(text)
+
     def _show_heatmaps(self) -> None:
         paths = _latest_heatmaps()
         if not paths:
@@ -379,7 +445,7 @@ class PenneyApp(App):
     def _update_data_and_figures(self, additional: int, bits: int, deck_value: str) -> None:
         worker = get_current_worker()
         DATA_DIR.mkdir(parents=True, exist_ok=True)
-        scoring_workers = _score_workers(len(_pair_options(bits)))
+        scoring_workers = _score_workers()
         if not deck_value or deck_value == "__new__":
             deck_folder_name = f"deck-{int(time.time())}_decks"
             deck_folder = DATA_DIR / deck_folder_name
@@ -388,13 +454,21 @@ class PenneyApp(App):
             deck_folder = DATA_DIR / deck_folder_name
 
         FIGURES_DIR.mkdir(parents=True, exist_ok=True)
+        results_warned = False
+
+        def _record_results(decks: Deck) -> None:
+            nonlocal results_warned
+            warning = _record_deck_results(deck_folder, bits, decks)
+            if warning and not results_warned:
+                results_warned = True
+                self.call_from_thread(self.notify, warning, severity="warning", timeout=15)
 
-        existing_decks: list[str] = []
+        existing_decks = Deck([])
         tricks_scores: list = []
         cards_scores: list = []
         if deck_folder.exists():
             self.call_from_thread(self._set_status, f"Loading decks from {deck_folder.name}...")
-            existing_decks = saving.load_decks(str(deck_folder))._decks
+            existing_decks = saving.load_decks(str(deck_folder))
         else:
             self.call_from_thread(self._set_status, f"Creating new deck set {deck_folder_name}...")
         had_existing_decks = bool(existing_decks)
@@ -408,40 +482,30 @@ class PenneyApp(App):
 
         if existing_decks:
             cached_tricks = _load_score_cache(deck_folder, bits, True, len(existing_decks))
-            if cached_tricks is not None:
-                self.call_from_thread(self._set_status, "Loaded cached trick scores.")
-                tricks_scores = cached_tricks
-            else:
-                self.call_from_thread(
-                    self._set_status, f"Scoring existing decks (tricks) across {scoring_workers} CPU cores..."
-                )
-                tricks_scores = _score_rows_parallel(existing_decks, bits, True)
-
             cached_cards = _load_score_cache(deck_folder, bits, False, len(existing_decks))
-            if cached_cards is not None:
-                self.call_from_thread(self._set_status, "Loaded cached card scores.")
-                cards_scores = cached_cards
+            if cached_tricks is not None and cached_cards is not None:
+                self.call_from_thread(self._set_status, "Loaded cached trick and card scores.")
+                tricks_scores, cards_scores = cached_tricks, cached_cards
             else:
+                # one table pass gives both methods, so a single missing cache costs the same
                 self.call_from_thread(
-                    self._set_status, f"Scoring existing decks (cards) across {scoring_workers} CPU cores..."
+                    self._set_status,
+                    f"Scoring existing decks (tricks and cards) across {scoring_workers} CPU cores...",
                 )
-                cards_scores = _score_rows_parallel(existing_decks, bits, False)
+                tricks_scores, cards_scores = _score_rows_both(existing_decks, bits)
         else:
             first_chunk = min(additional, 10000 if additional >= 100000 else additional)
             self.call_from_thread(self._set_status, f"Generating {first_chunk} initial decks...")
             seed_decks = deck_gen(num_decks=first_chunk)
             saving.save_decks(seed_decks, filename=deck_folder_name)
+            _record_results(seed_decks)
             generated += first_chunk
             remaining = additional - first_chunk
-            existing_decks = list(seed_decks._decks)
+            existing_decks = seed_decks
             self.call_from_thread(
-                self._set_status, f"Scoring initial decks (tricks) across {scoring_workers} CPU cores..."
+                self._set_status, f"Scoring initial decks (tricks and cards) across {scoring_workers} CPU cores..."
             )
-            tricks_scores = _score_rows_parallel(existing_decks, bits, True)
-            self.call_from_thread(
-                self._set_status, f"Scoring initial decks (cards) across {scoring_workers} CPU cores..."
-            )
-            cards_scores = _score_rows_parallel(existing_decks, bits, False)
+            tricks_scores, cards_scores = _score_rows_both(existing_decks, bits)
             if additional >= 100000:
                 self.call_from_thread(self._set_progress, generated, total)
         if had_existing_decks:
@@ -452,47 +516,72 @@ class PenneyApp(App):
         if remaining > 0:
             if additional >= 100000:
                 chunk_size = 10000
+                last_live = last_png = time.monotonic()
+                self.call_from_thread(self._set_stop_enabled, True)
                 while generated < total:
                     if worker.is_cancelled:
                         return
+                    if self._stop_requested.is_set():
+                        # keep everything generated so far and finish as if the run had been this size
+                        break
                     chunk = min(chunk_size, total - generated)
                     self.call_from_thread(self._set_status, f"Generating decks {generated + 1}-{generated + chunk}...")
                     new_decks = deck_gen(num_decks=chunk)
-                    new_deck_list = list(new_decks._decks)
-                    tricks_scores = _merge_score_rows(tricks_scores, _score_rows_parallel(new_deck_list, bits, True))
-                    cards_scores = _merge_score_rows(cards_scores, _score_rows_parallel(new_deck_list, bits, False))
+                    new_tricks_scores, new_cards_scores = _score_rows_both(new_decks, bits)
+                    tricks_scores = _merge_score_rows(tricks_scores, new_tricks_scores)
+                    cards_scores = _merge_score_rows(cards_scores, new_cards_scores)
                     saving.save_decks(new_decks, filename=deck_folder_name)
-                    existing_decks.extend(new_deck_list)
+                    existing_decks.extend(new_decks)
+                    _record_results(existing_decks)
                     generated += chunk
                     self.call_from_thread(self._set_progress, generated, total)
+
+                    now = time.monotonic()
+                    if now - last_live >= LIVE_VIEW_SECONDS:
+                        last_live = now
+                        live = "\n\n".join(
+                            text_heatmap(scores, by_tricks=by_tricks, stderr=_win_stderr(scores, by_tricks))
+                            for scores, by_tricks in ((tricks_scores, True), (cards_scores, False))
+                        )
+                        self.call_from_thread(self._show_live_scores, live)
+                    if LIVE_HEATMAP_SECONDS > 0 and now - last_png >= LIVE_HEATMAP_SECONDS:
+                        last_png = now
+                        make_heatmap(tricks_scores, by_tricks=True, stderr=_win_stderr(tricks_scores, True))
+                        make_heatmap(cards_scores, by_tricks=False, stderr=_win_stderr(cards_scores, False))
+                self.call_from_thread(self._set_stop_enabled, False)
             else:
                 self.call_from_thread(self._set_status, f"Generating {remaining} decks...")
                 new_decks = deck_gen(num_decks=remaining)
-                new_deck_list = list(new_decks._decks)
-                tricks_scores = _merge_score_rows(tricks_scores, _score_rows_parallel(new_deck_list, bits, True))
-                cards_scores = _merge_score_rows(cards_scores, _score_rows_parallel(new_deck_list, bits, False))
+                new_tricks_scores, new_cards_scores = _score_rows_both(new_decks, bits)
+                tricks_scores = _merge_score_rows(tricks_scores, new_tricks_scores)
+                cards_scores = _merge_score_rows(cards_scores, new_cards_scores)
                 saving.save_decks(new_decks, filename=deck_folder_name)
-                existing_decks.extend(new_deck_list)
+                existing_decks.extend(new_decks)
+                _record_results(existing_decks)
                 generated += remaining
 
-        parser_tricks = Parser(Deck(existing_decks), bits=bits, scoring_by_tricks=True)
+        parser_tricks = Parser(existing_decks, bits=bits, scoring_by_tricks=True)
         parser_tricks.scores = tricks_scores
-        parser_cards = Parser(Deck(existing_decks), bits=bits, scoring_by_tricks=False)
+        parser_cards = Parser(existing_decks, bits=bits, scoring_by_tricks=False)
         parser_cards.scores = cards_scores
 
         # Persist score caches so subsequent runs can avoid rescoring existing decks.
         try:
-            _save_score_cache(deck_folder, bits, True, parser_tricks.scores, len(parser_tricks.decks._decks))
-            _save_score_cache(deck_folder, bits, False, parser_cards.scores, len(parser_cards.decks._decks))
+            _save_score_cache(deck_folder, bits, True, parser_tricks.scores, len(parser_tricks.decks))
+            _save_score_cache(deck_folder, bits, False, parser_cards.scores, len(parser_cards.decks))
         except Exception:
             # Cache write failure shouldn't block figure generation.
             pass
 
-        make_heatmap(parser_tricks.scores, by_tricks=True, parser=parser_tricks)
-        make_heatmap(parser_cards.scores, by_tricks=False, parser=parser_cards)
+        make_heatmap(
+            parser_tricks.scores, by_tricks=True, parser=parser_tricks, stderr=_win_stderr(parser_tricks.scores, True)
+        )
+        make_heatmap(
+            parser_cards.scores, by_tricks=False, parser=parser_cards, stderr=_win_stderr(parser_cards.scores, False)
+        )
 
         self.call_from_thread(
-            self._set_status, f"Generated {additional} decks in {deck_folder_name} and updated figures."
+            self._set_status, f"Generated {generated} decks in {deck_folder_name} and updated figures."
         )
         self.call_from_thread(self._set_progress, 0, 0)
         self.call_from_thread(self._refresh_deck_file_options)
@@ -515,21 +604,29 @@ class PenneyApp(App):
             self.call_from_thread(self._set_status, f"Deck file {deck_value} not found.")
             return
         self.call_from_thread(self._set_status, f"Loading decks from {deck_folder.name}...")
-        decks = saving.load_decks(str(deck_folder))._decks
+        decks = saving.load_decks(str(deck_folder))
         if not decks:
             self.call_from_thread(self._set_status, f"No decks found in {deck_folder.name}.")
             return
-        scoring_workers = _score_workers(len(_pair_options(bits)))
+        scoring_workers = _score_workers()
         self.call_from_thread(
             self._set_status, f"Re-scoring {len(decks)} decks by {method} across {scoring_workers} CPU cores..."
         )
-        parser = Parser(Deck(decks), bits=bits, scoring_by_tricks=(method == "tricks"))
-        parser.scores = _score_rows_parallel(decks, bits, method == "tricks")
+        parser = Parser(decks, bits=bits, scoring_by_tricks=(method == "tricks"))
+        # the table pass scores both methods at once, so refresh both caches
+        tricks_scores, cards_scores = _score_rows_both(decks, bits)
+        parser.scores = tricks_scores if method == "tricks" else cards_scores
         try:
-            _save_score_cache(deck_folder, bits, method == "tricks", parser.scores, len(decks))
+            _save_score_cache(deck_folder, bits, True, tricks_scores, len(decks))
+            _save_score_cache(deck_folder, bits, False, cards_scores, len(decks))
         except Exception:
             pass
-        make_heatmap(parser.scores, by_tricks=(method == "tricks"), parser=parser)
+        make_heatmap(
+            parser.scores,
+            by_tricks=(method == "tricks"),
+            parser=parser,
+            stderr=_win_stderr(parser.scores, method == "tricks"),
+        )
         self.call_from_thread(self._set_status, f"Re-scored {len(decks)} decks by {method}.")
         self.call_from_thread(self._show_heatmaps)
 
@@ -541,6 +638,10 @@ class PenneyApp(App):
         if event.button.id == "run":
             self._run_update()
             return
+        if event.button.id == "stop":
+            self._stop_requested.set()
+            self._set_status("Stopping after the current chunk...")
+            return
         if event.button.id == "rescore":
             self._run_rescore()
             return
@@ -555,6 +656,7 @@ class PenneyApp(App):
             self._run_update()
 
     def on_mount(self) -> None:
+        self._stop_requested = threading.Event()
         self._set_progress(0, 0)
         self._refresh_deck_file_options()
 
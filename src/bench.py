@@ -0,0 +1,84 @@
+from __future__ import annotations
+import os
+import time
+import shutil
+import argparse
+from itertools import permutations
+from src.decks import deck_gen
+from src import saving
+from src.parser import score_counts, score_counts_both
+
+# Throughput benchmarks for deck generation, deck folder I/O and scoring.
+#
+#   python -m src.bench --decks 1000000 --workers 8
+
+
+def _timed(fn):
+    start = time.perf_counter()
+    result = fn()
+    return result, time.perf_counter() - start
+
+
+def _rate(count: float, seconds: float) -> float:
+    return count / seconds if seconds > 0 else float("inf")
+
+
+def bench_io(num_decks: int = 1_000_000, deck_size: int = 52, workers: int | None = None, file_size: int = 100_000):
+    """Generate, save and reload a deck folder; returns {step: (seconds, decks/s, MB/s)}"""
+    folder = f"bench-{os.getpid()}_decks"
+    path = f"data/{folder}"
+    decks, gen_s = _timed(lambda: deck_gen(num_decks=num_decks, deck_size=deck_size))
+    try:
+        _, save_s = _timed(lambda: saving.save_decks(decks, folder, file_size=file_size, workers=workers))
+        size_mb = sum(os.path.getsize(f"{path}/{f}") for f in os.listdir(path)) / 1e6
+        loaded, load_s = _timed(lambda: saving.load_decks(path, workers=workers))
+        if loaded != decks:
+            raise RuntimeError("reloaded decks differ from the saved ones")
+    finally:
+        shutil.rmtree(path, ignore_errors=True)
+    return {
+        "generate": (gen_s, _rate(num_decks, gen_s), _rate(num_decks * deck_size / 8e6, gen_s)),
+        "save": (save_s, _rate(num_decks, save_s), _rate(size_mb, save_s)),
+        "load": (load_s, _rate(num_decks, load_s), _rate(size_mb, load_s)),
+    }
+
+
+def bench_scoring(num_decks: int = 1_000_000, bits: int = 3, workers: int | None = None):
+    """Score every pair by scanning and by next-occurrence tables; returns {step: (seconds, decks/s, MB/s)}"""
+    decks = deck_gen(num_decks=num_decks)
+    options = [str(bin(w))[2:].zfill(bits) for w in range(2**bits)]
+    pairs = list(permutations(options, 2))
+    mb = decks.array.nbytes / 1e6
+    _, scan_s = _timed(lambda: score_counts(decks.array, pairs, True, workers))
+    _, table_s = _timed(lambda: score_counts_both(decks.array, pairs, workers))
+    return {
+        "scan (tricks)": (scan_s, _rate(num_decks, scan_s), _rate(mb, scan_s)),
+        "tables (tricks + cards)": (table_s, _rate(num_decks, table_s), _rate(mb, table_s)),
+    }
+
+
+def _report(title: str, results: dict) -> None:
+    print(title)
+    for step, (seconds, decks_per_s, mb_per_s) in results.items():
+        print(f"  {step:<24} {seconds:9.3f} s {decks_per_s:14,.0f} decks/s {mb_per_s:10.1f} MB/s")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark deck I/O and scoring throughput")
+    parser.add_argument("--decks", type=int, default=1_000_000)
+    parser.add_argument("--bits", type=int, default=3, choices=(3, 4))
+    parser.add_argument("--workers", type=int, default=None, help="threads for I/O and scoring (default: all cores)")
+    parser.add_argument("--file-size", type=int, default=100_000, help="decks per chunk file")
+    args = parser.parse_args()
+    _report(
+        f"deck I/O, {args.decks:_} decks, {args.workers or os.cpu_count()} workers",
+        bench_io(args.decks, workers=args.workers, file_size=args.file_size),
+    )
+    _report(
+        f"scoring, {args.decks:_} decks, {args.bits} bits",
+        bench_scoring(args.decks, args.bits, args.workers),
+    )
+
+
+if __name__ == "__main__":
+    main()
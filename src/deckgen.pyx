@@ -6,6 +6,7 @@ from libc.stddef cimport size_t
 from libc.stdint cimport uintptr_t
 from cpython.mem cimport PyMem_Malloc, PyMem_Free
 from cpython.unicode cimport PyUnicode_FromStringAndSize
+from libc.string cimport memcpy
 
 
 IF UNAME_SYSNAME == "Linux":
@@ -122,3 +123,53 @@ cpdef list generate_deck_strings(int num_decks, int deck_size):
         PyMem_Free(out)
 
     return decks
+
+
+cpdef bytearray generate_deck_buffer(int num_decks, int deck_size):
+    """
+    generate random decks containing only zeros and ones, returned as one contiguous
+    bytearray of num_decks * deck_size cards holding the values 0 and 1
+    """
+    cdef int half
+    cdef int d, i, j
+    cdef unsigned char* deck = NULL
+    cdef unsigned char* out
+    cdef bytearray buf
+    cdef unsigned char tmp
+    IF not (UNAME_SYSNAME == "Darwin"):
+        cdef unsigned int rng_state
+
+    half = deck_size // 2
+    buf = bytearray(<Py_ssize_t>num_decks * deck_size)
+    if num_decks == 0 or deck_size == 0:
+        return buf
+    out = <unsigned char*>(<char*>buf)
+
+    deck = <unsigned char*>PyMem_Malloc(deck_size)
+    if deck == NULL:
+        raise MemoryError()
+
+    for i in range(half):
+        deck[i] = 0
+    for i in range(half, deck_size):
+        deck[i] = 1
+    IF not (UNAME_SYSNAME == "Darwin"):
+        rng_state = _seed32()
+
+    try:
+        with nogil:
+            for d in range(num_decks):
+                # the previous shuffle is as good a starting point as the sorted deck
+                for i in range(deck_size - 1, 0, -1):
+                    IF UNAME_SYSNAME == "Darwin":
+                        j = <int>_randbelow(<uint32_t>(i + 1))
+                    ELSE:
+                        j = <int>_randbelow(&rng_state, <uint32_t>(i + 1))
+                    tmp = deck[i]
+                    deck[i] = deck[j]
+                    deck[j] = tmp
+                memcpy(out + <size_t>d * deck_size, deck, deck_size)
+    finally:
+        PyMem_Free(deck)
+
+    return buf
@@ -1,70 +1,200 @@
 from __future__ import annotations
+from math import comb
 import numpy as np
 
 try:
-    from .deckgen import generate_deck_strings as _generate_deck_strings
+    from .deckgen import generate_deck_buffer as _generate_deck_buffer
 except Exception:
-    _generate_deck_strings = None
+    _generate_deck_buffer = None
+
+
+SAMPLING_MODES = ("iid", "antithetic", "stratified")
+
+
+def run_counts(cards: np.ndarray) -> np.ndarray:
+    """Number of same-colour runs in every deck of a (decks, deck_size) array of 0/1 cards"""
+    if cards.shape[1] == 0:
+        return np.zeros(cards.shape[0], dtype=np.int64)
+    return 1 + np.count_nonzero(cards[:, 1:] != cards[:, :-1], axis=1)
+
+
+def run_count_probabilities(deck_size: int) -> np.ndarray:
+    """
+    Exact chance that a shuffled deck of `deck_size` cards, half of each colour, has r runs,
+    indexed by r (0 to deck_size)
+    """
+    half = deck_size // 2
+    total = comb(deck_size, half)
+    probs = np.zeros(deck_size + 1)
+    for k in range(1, half + 1):
+        # k runs of each colour, either colour first
+        probs[2 * k] = 2 * comb(half - 1, k - 1) ** 2 / total
+        if k < half:
+            # k + 1 runs of the first colour, k of the other
+            probs[2 * k + 1] = 2 * comb(half - 1, k) * comb(half - 1, k - 1) / total
+    return probs
+
+
+def _compositions(rng: np.random.Generator, count: int, total: int, parts: int) -> np.ndarray:
+    """`count` uniformly random ways to split `total` into `parts` positive run lengths"""
+    cuts = np.sort(rng.random((count, total - 1)).argsort(axis=1)[:, : parts - 1] + 1, axis=1)
+    edges = np.concatenate(
+        (np.zeros((count, 1), dtype=np.int64), cuts, np.full((count, 1), total, dtype=np.int64)), axis=1
+    )
+    return np.diff(edges, axis=1)
+
+
+def _stratified_cards(num_decks: int, deck_size: int, rng: np.random.Generator) -> np.ndarray:
+    """
+    Decks allocated to every run count in proportion to its exact probability, uniform within it.
+
+    Fractional allocations are rounded systematically, so each run count's expected share is exact
+    and the pooled win rate stays unbiased. Rows are shuffled so any prefix is still a fair sample.
+    """
+    probs = run_count_probabilities(deck_size)
+    expected = num_decks * probs
+    alloc = np.floor(expected).astype(np.int64)
+    cum = np.cumsum(expected - alloc)
+    u = 1.0 - rng.random()  # in (0, 1]
+    alloc += (np.ceil(cum - u) - np.ceil(np.concatenate(([0.0], cum[:-1])) - u)).astype(np.int64)
+
+    half = deck_size // 2
+    cards = np.empty((num_decks, deck_size), dtype=np.uint8)
+    row = 0
+    for runs in np.flatnonzero(alloc):
+        count = int(alloc[runs])
+        first = rng.integers(0, 2, size=(count, 1), dtype=np.uint8)
+        lengths = np.empty((count, runs), dtype=np.int64)
+        lengths[:, 0::2] = _compositions(rng, count, half, (runs + 1) // 2)
+        lengths[:, 1::2] = _compositions(rng, count, half, runs // 2)
+        colours = np.empty((count, runs), dtype=np.uint8)
+        colours[:, 0::2] = first
+        colours[:, 1::2] = 1 - first
+        cards[row : row + count] = np.repeat(colours.ravel(), lengths.ravel()).reshape(count, deck_size)
+        row += count
+    return cards[rng.permutation(num_decks)]
 
 
 def deck_gen(
     num_decks: int = 1,
     deck_size: int = 52,
+    sampling: str = "iid",
 ) -> Deck:
     """
         Deck Parameters:
         `num_decks` - total number of decks to generate\n
         `deck_size` - number of cards in each deck\n
+        `sampling` - "iid" for independent shuffles, "antithetic" for shuffles paired with their
+        colour-inverted copy in rows 2i and 2i + 1, or "stratified" for decks spread over run
+        counts in proportion to their probability. Every deck has the same distribution in all
+        three modes; see `src.variance` for the matching error estimates\n
     """
     if deck_size % 2 == 1:
         raise ValueError("Deck size must be divisible by 2")
-
-    if _generate_deck_strings is not None:
-        deck_list = _generate_deck_strings(int(num_decks), int(deck_size))
-        return Deck(deck_list)
+    if sampling not in SAMPLING_MODES:
+        raise ValueError(f"Unknown sampling mode {sampling!r}, expected one of {SAMPLING_MODES}")
+
+    if sampling == "antithetic":
+        if num_decks % 2 == 1:
+            raise ValueError("Antithetic decks come in pairs, so the deck count must be even")
+        base = deck_gen(num_decks=num_decks // 2, deck_size=deck_size).array
+        cards = np.empty((int(num_decks), int(deck_size)), dtype=np.uint8)
+        cards[0::2] = base
+        cards[1::2] = 1 - base
+        return Deck(cards)
+    if sampling == "stratified" and deck_size > 0:
+        return Deck(_stratified_cards(int(num_decks), int(deck_size), np.random.default_rng()))
+
+    if _generate_deck_buffer is not None:
+        buf = _generate_deck_buffer(int(num_decks), int(deck_size))
+        return Deck(np.frombuffer(buf, dtype=np.uint8).reshape(int(num_decks), int(deck_size)))
 
     base_deck = np.concatenate(
         (np.zeros(deck_size // 2, dtype=np.uint8), np.ones(deck_size // 2, dtype=np.uint8))
     )  # get a deck of 1s and 0s
     all_deck = np.tile(base_deck, (num_decks, 1))  # copy it a bunch
-    deck_list = [
-        "".join(x) for x in np.random.default_rng().permuted(all_deck, axis=1).astype(str).tolist()
-    ]  # shuffle and convert to list of strings
-    x = Deck(deck_list)
-    return x
+    return Deck(np.random.default_rng().permuted(all_deck, axis=1))  # shuffle each deck
+
+
+def _as_card_array(decks) -> np.ndarray:
+    """Convert a list of 0/1 strings (or an existing array) to a 2-D uint8 array of 0s and 1s"""
+    if isinstance(decks, np.ndarray):
+        arr = decks.astype(np.uint8, copy=False)
+        return arr.reshape(1, -1) if arr.ndim == 1 else arr
+    if len(decks) == 0:
+        return np.empty((0, 0), dtype=np.uint8)
+    deck_size = len(decks[0])
+    raw = np.frombuffer("".join(decks).encode("ascii"), dtype=np.uint8)
+    return (raw - ord("0")).reshape(len(decks), deck_size)
 
 
 class Deck:
-    """Deck object. Use `deck_gen()` or `saving.load()` to create decks"""
+    """
+    Deck object. Use `deck_gen()` or `saving.load()` to create decks
+
+    Cards are stored as one contiguous (decks, deck_size) uint8 array of 0s and 1s with spare
+    capacity at the end, so appending is amortized O(1) and slices are views of the same buffer.
+    """
 
-    __slots__ = ("_decks", "_deck_count", "_deck_size")
+    __slots__ = ("_buf", "_deck_count", "_deck_size")
 
     def __init__(self, decks):
-
-        self._decks: list[str] = decks
-        self._deck_count: int = len(self._decks)
-        self._deck_size: int = len(self._decks[0])
+        """Takes a list of 0/1 strings or a 2-D array of 0s and 1s"""
+        self._buf: np.ndarray = _as_card_array(decks)
+        self._deck_count: int = self._buf.shape[0]
+        self._deck_size: int = self._buf.shape[1]
 
     @property
     def deck_size(self):
         """Number of cards in each deck"""
         return self._deck_size
-    
+
     @property
-    def decks(self):
-        """Raw list of decks"""
-        return self._decks
-    
+    def array(self) -> np.ndarray:
+        """(decks, deck_size) uint8 view of the cards"""
+        return self._buf[: self._deck_count]
 
-    def __repr__(self) -> str:
-        return "\n".join(self._decks)
+    @property
+    def decks(self) -> list[str]:
+        """Decks as a list of 0/1 strings (materialized on every call)"""
+        return [self._row_str(i) for i in range(self._deck_count)]
 
-    def __getitem__(self, key: int) -> str: # index directly into deck object 
-        return self._decks[key]
+    def encoded(self) -> list[bytes]:
+        """Decks as ASCII bytes, the input format of the scoring kernels"""
+        raw = (self.array + ord("0")).tobytes()
+        n = self._deck_size
+        return [raw[i : i + n] for i in range(0, len(raw), n)] if n else []
+
+    def chunks(self, chunk_size: int):
+        """Yield consecutive zero-copy Deck views of at most `chunk_size` decks"""
+        for start in range(0, self._deck_count, max(1, chunk_size)):
+            yield self[start : start + chunk_size]
+
+    def _row_str(self, i: int) -> str:
+        return (self._buf[i] + ord("0")).tobytes().decode("ascii")
+
+    def __repr__(self) -> str:
+        return "\n".join(self.decks)
+
+    def __getitem__(self, key):  # index directly into deck object
+        if isinstance(key, slice):
+            if key.step not in (None, 1):
+                # stepped slices are strided views, the kernels need contiguous rows
+                return Deck(np.ascontiguousarray(self.array[key]))
+            return Deck(self.array[key])
+        if key < 0:
+            key += self._deck_count
+        if not 0 <= key < self._deck_count:
+            raise IndexError("deck index out of range")
+        return self._row_str(key)
+
+    def __iter__(self):
+        for i in range(self._deck_count):
+            yield self._row_str(i)
 
     def __eq__(self, other) -> bool:  ## deck equality defined by same deck content and dimensions
         if type(other) == Deck:
-            return self._decks == other._decks
+            return self.array.shape == other.array.shape and bool(np.array_equal(self.array, other.array))
         else:
             return False
 
@@ -78,12 +208,35 @@ class Deck:
         """Number of decks contained in the object"""
         return self._deck_count
 
+    def _reserve(self, count: int) -> None:
+        """Make room for at least `count` decks, growing capacity geometrically"""
+        if count <= self._buf.shape[0] and self._buf.flags.writeable and self._buf.base is None:
+            return
+        capacity = max(count, 2 * self._buf.shape[0], 1024)
+        buf = np.empty((capacity, self._deck_size), dtype=np.uint8)
+        buf[: self._deck_count] = self._buf[: self._deck_count]
+        self._buf = buf
+
+    def extend(self, other) -> None:
+        """Append decks (a Deck, list of 0/1 strings or card array) in place"""
+        new = other.array if isinstance(other, Deck) else _as_card_array(other)
+        if new.shape[0] == 0:
+            return
+        if self._deck_count == 0 and self._deck_size == 0:
+            self._deck_size = new.shape[1]
+            self._buf = np.empty((0, self._deck_size), dtype=np.uint8)
+        if new.shape[1] != self._deck_size:
+            raise ValueError("Deck sizes do not match")
+        end = self._deck_count + new.shape[0]
+        self._reserve(end)
+        self._buf[self._deck_count : end] = new
+        self._deck_count = end
+
     def add_decks(self, other: Deck):
         if other.deck_size != self.deck_size:
             Warning("Deck sizes do not match")
             return
         else:
-            self._decks += other._decks
-            self._deck_count = len(self._decks)
+            self.extend(other)
             print(f"{other._deck_count} decks successfully added")
             return
@@ -1,10 +1,12 @@
 # cython: language_level=3, boundscheck=False, wraparound=False, cdivision=True
 
 from cpython.bytes cimport PyBytes_AS_STRING, PyBytes_GET_SIZE
-from libc.stdint cimport uint32_t, uint8_t
+from libc.stdint cimport int8_t, uint32_t, uint8_t
 import numpy as np
 cimport numpy as cnp
 
+include "trace_hook.pxi"
+
 
 cdef inline uint32_t pack3(const uint8_t* s, Py_ssize_t i) noexcept nogil:
     # pack 3 bytes into a single uint32
@@ -21,11 +23,12 @@ cdef inline uint32_t pack4(const uint8_t* s, Py_ssize_t i) noexcept nogil:
             (<uint32_t>s[i+3]))
 
 
-cdef inline void score_one3(const uint8_t* s, Py_ssize_t n,
-                            uint32_t p1t, uint32_t p2t,
-                            bint aligned,
-                            long* p1cards, long* p2cards, long* drawcards,
-                            long* p1tricks, long* p2tricks) noexcept nogil:
+cdef inline Py_ssize_t score_one3(const uint8_t* s, Py_ssize_t n,
+                                  uint32_t p1t, uint32_t p2t,
+                                  bint aligned,
+                                  long* p1cards, long* p2cards, long* drawcards,
+                                  long* p1tricks, long* p2tricks,
+                                  Recorder* events, int64_t deck, Py_ssize_t at) noexcept nogil:
     cdef Py_ssize_t offset = 0
     cdef Py_ssize_t i
     cdef Py_ssize_t step = 3 if aligned else 1
@@ -39,7 +42,7 @@ cdef inline void score_one3(const uint8_t* s, Py_ssize_t n,
     p2tricks[0] = 0
     if n < 3:
         drawcards[0] = n
-        return
+        return at
 
     while offset <= n - 3:
         i = offset
@@ -47,12 +50,16 @@ cdef inline void score_one3(const uint8_t* s, Py_ssize_t n,
         while i <= n - 3:
             tri = pack3(s, i)
             if tri == p1t:
+                if Recorder is TraceEvent:
+                    at = record_trick(events, at, deck, p1tricks[0] + p2tricks[0], i, True, (i - offset) + 3)
                 p1cards[0] += (i - offset) + 3
                 p1tricks[0] += 1
                 offset = i + 3
                 found = True
                 break
             elif tri == p2t:
+                if Recorder is TraceEvent:
+                    at = record_trick(events, at, deck, p1tricks[0] + p2tricks[0], i, False, (i - offset) + 3)
                 p2cards[0] += (i - offset) + 3
                 p2tricks[0] += 1
                 offset = i + 3
@@ -63,13 +70,15 @@ cdef inline void score_one3(const uint8_t* s, Py_ssize_t n,
             break
 
     drawcards[0] = n - p1cards[0] - p2cards[0]
+    return at
 
 
-cdef inline void score_one4(const uint8_t* s, Py_ssize_t n,
-                            uint32_t p1t, uint32_t p2t,
-                            bint aligned,
-                            long* p1cards, long* p2cards, long* drawcards,
-                            long* p1tricks, long* p2tricks) noexcept nogil:
+cdef inline Py_ssize_t score_one4(const uint8_t* s, Py_ssize_t n,
+                                  uint32_t p1t, uint32_t p2t,
+                                  bint aligned,
+                                  long* p1cards, long* p2cards, long* drawcards,
+                                  long* p1tricks, long* p2tricks,
+                                  Recorder* events, int64_t deck, Py_ssize_t at) noexcept nogil:
     cdef Py_ssize_t offset = 0
     cdef Py_ssize_t i
     cdef Py_ssize_t step = 4 if aligned else 1
@@ -83,7 +92,7 @@ cdef inline void score_one4(const uint8_t* s, Py_ssize_t n,
     p2tricks[0] = 0
     if n < 4:
         drawcards[0] = n
-        return
+        return at
 
     while offset <= n - 4:
         i = offset
@@ -91,12 +100,16 @@ cdef inline void score_one4(const uint8_t* s, Py_ssize_t n,
         while i <= n - 4:
             quad = pack4(s, i)
             if quad == p1t:
+                if Recorder is TraceEvent:
+                    at = record_trick(events, at, deck, p1tricks[0] + p2tricks[0], i, True, (i - offset) + 4)
                 p1cards[0] += (i - offset) + 4
                 p1tricks[0] += 1
                 offset = i + 4
                 found = True
                 break
             elif quad == p2t:
+                if Recorder is TraceEvent:
+                    at = record_trick(events, at, deck, p1tricks[0] + p2tricks[0], i, False, (i - offset) + 4)
                 p2cards[0] += (i - offset) + 4
                 p2tricks[0] += 1
                 offset = i + 4
@@ -107,6 +120,7 @@ cdef inline void score_one4(const uint8_t* s, Py_ssize_t n,
             break
 
     drawcards[0] = n - p1cards[0] - p2cards[0]
+    return at
 
 
 def winner_counts_for_pair(list decks_bytes, str p1, str p2, bint aligned=False, bint score_by_tricks=True) -> np.int64_t[:]:
@@ -156,7 +170,7 @@ def winner_counts_for_pair(list decks_bytes, str p1, str p2, bint aligned=False,
             s = <const uint8_t*> PyBytes_AS_STRING(db)
             n = PyBytes_GET_SIZE(db)
             with nogil:
-                score_one3(s, n, p1t, p2t, aligned, &p1cards, &p2cards, &drawcards, &p1tricks, &p2tricks)
+                score_one3(s, n, p1t, p2t, aligned, &p1cards, &p2cards, &drawcards, &p1tricks, &p2tricks, <NoTrace*>NULL, 0, 0)
 
             if score_by_cards:
                 if p1cards > p2cards:
@@ -178,7 +192,7 @@ def winner_counts_for_pair(list decks_bytes, str p1, str p2, bint aligned=False,
             s = <const uint8_t*> PyBytes_AS_STRING(db)
             n = PyBytes_GET_SIZE(db)
             with nogil:
-                score_one4(s, n, p1t, p2t, aligned, &p1cards, &p2cards, &drawcards, &p1tricks, &p2tricks)
+                score_one4(s, n, p1t, p2t, aligned, &p1cards, &p2cards, &drawcards, &p1tricks, &p2tricks, <NoTrace*>NULL, 0, 0)
 
             if score_by_cards:
                 if p1cards > p2cards:
@@ -196,3 +210,312 @@ def winner_counts_for_pair(list decks_bytes, str p1, str p2, bint aligned=False,
                     c2 += 1
 
     return np.array([c0, c1, c2], dtype=np.int64)
+
+
+def outcomes_for_pair(list decks_bytes, str p1, str p2, bint aligned=False, bint score_by_tricks=True):
+    """
+    same inputs as `winner_counts_for_pair`, but keeps the result of every deck instead of
+    only the aggregate counts.
+
+    returns a tuple of (outcomes, margins):
+        outcomes: int8 array, 1 where p1 won the deck, -1 where p2 won, 0 for a draw
+        margins: int16 array of p1's score minus p2's score (tricks or cards)
+    """
+    cdef bytes p1b = p1.encode("ascii")
+    cdef bytes p2b = p2.encode("ascii")
+    cdef Py_ssize_t w1 = PyBytes_GET_SIZE(p1b)
+
+    cdef const uint8_t* p1s = <const uint8_t*> PyBytes_AS_STRING(p1b)
+    cdef const uint8_t* p2s = <const uint8_t*> PyBytes_AS_STRING(p2b)
+
+    cdef uint32_t p1t
+    cdef uint32_t p2t
+    if w1 == 3:
+        p1t = pack3(p1s, 0)
+        p2t = pack3(p2s, 0)
+    else:
+        p1t = pack4(p1s, 0)
+        p2t = pack4(p2s, 0)
+
+    cdef Py_ssize_t k, m = len(decks_bytes)
+    out_arr = np.empty(m, dtype=np.int8)
+    margin_arr = np.empty(m, dtype=np.int16)
+    cdef cnp.int8_t[::1] out = out_arr
+    cdef cnp.int16_t[::1] margins = margin_arr
+    cdef bytes db
+    cdef const uint8_t* s
+    cdef Py_ssize_t n
+    cdef long p1cards, p2cards, drawcards
+    cdef long p1tricks, p2tricks
+    cdef long diff
+
+    for k in range(m):
+        db = <bytes>decks_bytes[k]
+        s = <const uint8_t*> PyBytes_AS_STRING(db)
+        n = PyBytes_GET_SIZE(db)
+        with nogil:
+            if w1 == 3:
+                score_one3(s, n, p1t, p2t, aligned, &p1cards, &p2cards, &drawcards, &p1tricks, &p2tricks, <NoTrace*>NULL, 0, 0)
+            else:
+                score_one4(s, n, p1t, p2t, aligned, &p1cards, &p2cards, &drawcards, &p1tricks, &p2tricks, <NoTrace*>NULL, 0, 0)
+
+        if score_by_tricks:
+            diff = p1tricks - p2tricks
+        else:
+            diff = p1cards - p2cards
+        margins[k] = <cnp.int16_t>diff
+        if diff > 0:
+            out[k] = 1
+        elif diff < 0:
+            out[k] = -1
+        else:
+            out[k] = 0
+
+    return out_arr, margin_arr
+
+
+cdef uint32_t _card_pattern(str p):
+    # pack a 0/1 pattern string the same way pack3/pack4 pack a row of 0/1 card values
+    cdef uint32_t word = 0
+    for ch in p:
+        word = (word << 8) | (1 if ch == "1" else 0)
+    return word
+
+
+def winner_counts_array(const uint8_t[:, ::1] cards, str p1, str p2, bint aligned=False,
+                        bint score_by_tricks=True, Py_ssize_t start=0, Py_ssize_t stop=-1) -> np.int64_t[:]:
+    """
+    same result as `winner_counts_for_pair`, but reads rows [start, stop) of a contiguous
+    (decks, deck_size) array of 0/1 cards, i.e. `Deck.array`, directly.
+
+    no bytes list or pointer table is built per call and the whole scan runs without the GIL,
+    so threads can share one array and split it by pair and by deck range.
+    """
+    cdef Py_ssize_t w1 = len(p1)
+    cdef uint32_t p1t = _card_pattern(p1)
+    cdef uint32_t p2t = _card_pattern(p2)
+    cdef Py_ssize_t n = cards.shape[1]
+    cdef Py_ssize_t k
+    cdef long c0 = 0
+    cdef long c1 = 0
+    cdef long c2 = 0
+    cdef long p1cards, p2cards, drawcards
+    cdef long p1tricks, p2tricks
+    cdef long diff
+
+    if stop < 0 or stop > cards.shape[0]:
+        stop = cards.shape[0]
+    if start < 0:
+        start = 0
+    if start >= stop:
+        return np.zeros(3, dtype=np.int64)
+
+    with nogil:
+        for k in range(start, stop):
+            if w1 == 3:
+                score_one3(&cards[k, 0], n, p1t, p2t, aligned, &p1cards, &p2cards, &drawcards, &p1tricks, &p2tricks, <NoTrace*>NULL, 0, 0)
+            else:
+                score_one4(&cards[k, 0], n, p1t, p2t, aligned, &p1cards, &p2cards, &drawcards, &p1tricks, &p2tricks, <NoTrace*>NULL, 0, 0)
+
+            if score_by_tricks:
+                diff = p1tricks - p2tricks
+            else:
+                diff = p1cards - p2cards
+            if diff > 0:
+                c0 += 1
+            elif diff < 0:
+                c1 += 1
+            else:
+                c2 += 1
+
+    return np.array([c0, c1, c2], dtype=np.int64)
+
+
+def build_next_tables(const uint8_t[:, ::1] cards, int bits, bint aligned=False):
+    """
+    precompute, for every deck in a (decks, deck_size) array of 0/1 cards, the position of the
+    next occurrence of every `bits`-card pattern at or after every position.
+
+    returns a uint8 array shaped (decks, deck_size + 1, 2**bits); entries with no later occurrence
+    hold deck_size. built in one backward pass per deck, and independent of the pairs being scored,
+    so one table serves every pair and both scoring methods.
+    """
+    cdef Py_ssize_t m = cards.shape[0]
+    cdef Py_ssize_t n = cards.shape[1]
+    cdef Py_ssize_t width = 1 << bits
+    cdef Py_ssize_t k, i, j
+    cdef uint32_t code
+    if n > 254:
+        raise ValueError("next-occurrence tables hold uint8 positions, so decks are limited to 254 cards")
+    tables_arr = np.empty((m, n + 1, width), dtype=np.uint8)
+    cdef uint8_t[:, :, ::1] tables = tables_arr
+
+    with nogil:
+        for k in range(m):
+            for j in range(width):
+                tables[k, n, j] = <uint8_t>n
+            code = 0
+            i = n - 1
+            while i >= 0:
+                # code of the window starting at i, built from the window starting at i + 1
+                code = (code >> 1) | (<uint32_t>cards[k, i] << (bits - 1))
+                for j in range(width):
+                    tables[k, i, j] = tables[k, i + 1, j]
+                if i <= n - bits and (not aligned or i % bits == 0):
+                    tables[k, i, code] = <uint8_t>i
+                i -= 1
+    return tables_arr
+
+
+cdef int check_table_patterns(const uint8_t[:, :, ::1] tables, str p1, str p2) except -1:
+    # the kernels below index the last table axis by pattern code without bounds checks
+    if len(p1) != len(p2):
+        raise ValueError(f"patterns {p1!r} and {p2!r} differ in length")
+    if tables.shape[2] != 1 << len(p1):
+        raise ValueError(
+            f"{len(p1)}-card patterns need tables built with bits={len(p1)}, "
+            f"these hold {tables.shape[2]} pattern columns"
+        )
+    return 0
+
+
+cdef inline void play_tables(const uint8_t* t, Py_ssize_t width, Py_ssize_t n, Py_ssize_t w,
+                             Py_ssize_t c1, Py_ssize_t c2, long* p1cards, long* p2cards,
+                             long* p1tricks, long* p2tricks) noexcept nogil:
+    # play one deck from its (n + 1, width) next-occurrence table; two lookups per trick
+    cdef Py_ssize_t offset = 0, a, b
+    p1cards[0] = 0
+    p2cards[0] = 0
+    p1tricks[0] = 0
+    p2tricks[0] = 0
+    while offset <= n - w:
+        a = t[offset * width + c1]
+        b = t[offset * width + c2]
+        if a < b:
+            p1cards[0] += a - offset + w
+            p1tricks[0] += 1
+            offset = a + w
+        elif b < n:
+            p2cards[0] += b - offset + w
+            p2tricks[0] += 1
+            offset = b + w
+        else:
+            break
+
+
+def winner_counts_tables(const uint8_t[:, :, ::1] tables, str p1, str p2,
+                         Py_ssize_t start=0, Py_ssize_t stop=-1) -> np.int64_t[:, :]:
+    """
+    score rows [start, stop) of tables from `build_next_tables`. every trick is two table
+    lookups instead of a forward scan of the deck.
+
+    returns an int64 array shaped (2, 3): [p1 wins, p2 wins, draws] scored by tricks, then by cards.
+    """
+    check_table_patterns(tables, p1, p2)
+    cdef Py_ssize_t n = tables.shape[1] - 1
+    cdef Py_ssize_t width = tables.shape[2]
+    cdef Py_ssize_t w = len(p1)
+    cdef Py_ssize_t c1 = int(p1, 2)
+    cdef Py_ssize_t c2 = int(p2, 2)
+    cdef Py_ssize_t k
+    cdef long p1cards, p2cards, p1tricks, p2tricks
+    cdef long t0 = 0, t1 = 0, t2 = 0
+    cdef long d0 = 0, d1 = 0, d2 = 0
+
+    if stop < 0 or stop > tables.shape[0]:
+        stop = tables.shape[0]
+    if start < 0:
+        start = 0
+
+    with nogil:
+        for k in range(start, stop):
+            play_tables(&tables[k, 0, 0], width, n, w, c1, c2, &p1cards, &p2cards, &p1tricks, &p2tricks)
+
+            if p1tricks > p2tricks:
+                t0 += 1
+            elif p2tricks > p1tricks:
+                t1 += 1
+            else:
+                t2 += 1
+            if p1cards > p2cards:
+                d0 += 1
+            elif p2cards > p1cards:
+                d1 += 1
+            else:
+                d2 += 1
+
+    return np.array([[t0, t1, t2], [d0, d1, d2]], dtype=np.int64)
+
+
+def outcomes_tables(const uint8_t[:, :, ::1] tables, str p1, str p2,
+                    Py_ssize_t start=0, Py_ssize_t stop=-1):
+    """
+    per-deck version of `winner_counts_tables`, for estimators that need more than the totals
+    (paired or stratified decks).
+
+    returns an int8 array shaped (2, stop - start): 1 where p1 won the deck, -1 where p2 won and
+    0 for a draw, scored by tricks, then by cards.
+    """
+    check_table_patterns(tables, p1, p2)
+    cdef Py_ssize_t n = tables.shape[1] - 1
+    cdef Py_ssize_t width = tables.shape[2]
+    cdef Py_ssize_t w = len(p1)
+    cdef Py_ssize_t c1 = int(p1, 2)
+    cdef Py_ssize_t c2 = int(p2, 2)
+    cdef Py_ssize_t k
+    cdef long p1cards, p2cards, p1tricks, p2tricks
+
+    if stop < 0 or stop > tables.shape[0]:
+        stop = tables.shape[0]
+    if start < 0:
+        start = 0
+    if stop < start:
+        stop = start
+    out_arr = np.empty((2, stop - start), dtype=np.int8)
+    cdef int8_t[:, ::1] out = out_arr
+
+    with nogil:
+        for k in range(start, stop):
+            play_tables(&tables[k, 0, 0], width, n, w, c1, c2, &p1cards, &p2cards, &p1tricks, &p2tricks)
+            out[0, k - start] = (p1tricks > p2tricks) - (p1tricks < p2tricks)
+            out[1, k - start] = (p1cards > p2cards) - (p1cards < p2cards)
+
+    return out_arr
+
+
+def margins_tables(const uint8_t[:, :, ::1] tables, str p1, str p2,
+                   Py_ssize_t start=0, Py_ssize_t stop=-1):
+    """
+    per-deck margins from the same table walk as `outcomes_tables`, for the per-deck result store.
+
+    returns an int16 array shaped (2, stop - start) of p1's score minus p2's score, by tricks,
+    then by cards; its sign is the outcome.
+    """
+    check_table_patterns(tables, p1, p2)
+    cdef Py_ssize_t n = tables.shape[1] - 1
+    cdef Py_ssize_t width = tables.shape[2]
+    cdef Py_ssize_t w = len(p1)
+    cdef Py_ssize_t c1 = int(p1, 2)
+    cdef Py_ssize_t c2 = int(p2, 2)
+    cdef Py_ssize_t k
+    cdef long p1cards, p2cards, p1tricks, p2tricks
+
+    if stop < 0 or stop > tables.shape[0]:
+        stop = tables.shape[0]
+    if start < 0:
+        start = 0
+    if stop < start:
+        stop = start
+    out_arr = np.empty((2, stop - start), dtype=np.int16)
+    cdef cnp.int16_t[:, ::1] out = out_arr
+
+    with nogil:
+        for k in range(start, stop):
+            play_tables(&tables[k, 0, 0], width, n, w, c1, c2, &p1cards, &p2cards, &p1tricks, &p2tricks)
+            out[0, k - start] = <cnp.int16_t>(p1tricks - p2tricks)
+            out[1, k - start] = <cnp.int16_t>(p1cards - p2cards)
+
+    return out_arr
+
+
+include "trace_array.pxi"
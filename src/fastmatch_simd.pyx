@@ -7,6 +7,8 @@ from libc.stdio cimport printf
 import numpy as np
 cimport numpy as cnp
 
+include "trace_hook.pxi"
+
 
 cdef extern from *:
     """
@@ -782,6 +784,11 @@ cdef inline void _init_simd() noexcept:
             _simd_level = 0
 
 
+# pick the SIMD level once while the module is imported (single threaded even on free-threaded
+# builds), so the scoring functions only ever read `_simd_level` and never race on writing it
+_init_simd()
+
+
 cdef inline uint32_t pack3(const uint8_t* s, Py_ssize_t i) noexcept nogil:
     # pack 3 bytes into a single uint32
     return ((<uint32_t>s[i]   << 16) |
@@ -797,11 +804,12 @@ cdef inline uint32_t pack4(const uint8_t* s, Py_ssize_t i) noexcept nogil:
             (<uint32_t>s[i+3]))
 
 
-cdef inline void score_one3(const uint8_t* s, Py_ssize_t n,
-                            uint32_t p1t, uint32_t p2t,
-                            bint aligned,
-                            long* p1cards, long* p2cards, long* drawcards,
-                            long* p1tricks, long* p2tricks) noexcept nogil:
+cdef inline Py_ssize_t score_one3(const uint8_t* s, Py_ssize_t n,
+                                  uint32_t p1t, uint32_t p2t,
+                                  bint aligned,
+                                  long* p1cards, long* p2cards, long* drawcards,
+                                  long* p1tricks, long* p2tricks,
+                                  Recorder* events, int64_t deck, Py_ssize_t at) noexcept nogil:
     cdef Py_ssize_t offset = 0
     cdef Py_ssize_t i
     cdef Py_ssize_t step = 3 if aligned else 1
@@ -816,7 +824,7 @@ cdef inline void score_one3(const uint8_t* s, Py_ssize_t n,
     p2tricks[0] = 0
     if n < 3:
         drawcards[0] = n
-        return
+        return at
 
     while offset <= n - 3:
         found = False
@@ -844,6 +852,8 @@ cdef inline void score_one3(const uint8_t* s, Py_ssize_t n,
                 i += step
         if not found:
             break
+        if Recorder is TraceEvent:
+            at = record_trick(events, at, deck, p1tricks[0] + p2tricks[0], i, which == 1, (i - offset) + 3)
         if which == 1:
             p1cards[0] += (i - offset) + 3
             p1tricks[0] += 1
@@ -854,13 +864,15 @@ cdef inline void score_one3(const uint8_t* s, Py_ssize_t n,
             offset = i + 3
 
     drawcards[0] = n - p1cards[0] - p2cards[0]
+    return at
 
 
-cdef inline void score_one4(const uint8_t* s, Py_ssize_t n,
-                            uint32_t p1t, uint32_t p2t,
-                            bint aligned,
-                            long* p1cards, long* p2cards, long* drawcards,
-                            long* p1tricks, long* p2tricks) noexcept nogil:
+cdef inline Py_ssize_t score_one4(const uint8_t* s, Py_ssize_t n,
+                                  uint32_t p1t, uint32_t p2t,
+                                  bint aligned,
+                                  long* p1cards, long* p2cards, long* drawcards,
+                                  long* p1tricks, long* p2tricks,
+                                  Recorder* events, int64_t deck, Py_ssize_t at) noexcept nogil:
     cdef Py_ssize_t offset = 0
     cdef Py_ssize_t i
     cdef Py_ssize_t step = 4 if aligned else 1
@@ -875,7 +887,7 @@ cdef inline void score_one4(const uint8_t* s, Py_ssize_t n,
     p2tricks[0] = 0
     if n < 4:
         drawcards[0] = n
-        return
+        return at
 
     while offset <= n - 4:
         found = False
@@ -903,6 +915,8 @@ cdef inline void score_one4(const uint8_t* s, Py_ssize_t n,
                 i += step
         if not found:
             break
+        if Recorder is TraceEvent:
+            at = record_trick(events, at, deck, p1tricks[0] + p2tricks[0], i, which == 1, (i - offset) + 4)
         if which == 1:
             p1cards[0] += (i - offset) + 4
             p1tricks[0] += 1
@@ -913,6 +927,7 @@ cdef inline void score_one4(const uint8_t* s, Py_ssize_t n,
             offset = i + 4
 
     drawcards[0] = n - p1cards[0] - p2cards[0]
+    return at
 
 
 def winner_counts_for_pair(list decks_bytes, str p1, str p2, bint aligned=False, bint score_by_tricks=True) -> np.int64_t[:]:
@@ -927,7 +942,6 @@ def winner_counts_for_pair(list decks_bytes, str p1, str p2, bint aligned=False,
     returns an array of [count_p1, count_p2, count_draw] as int64s,
     where each count is the number of decks won by p1, won by p2, or drawn.
     """
-    _init_simd()
     cdef bytes p1b = p1.encode("ascii")
     cdef bytes p2b = p2.encode("ascii")
     cdef Py_ssize_t w1 = PyBytes_GET_SIZE(p1b)
@@ -978,7 +992,7 @@ def winner_counts_for_pair(list decks_bytes, str p1, str p2, bint aligned=False,
             for k in range(m):
                 s = ptrs[k]
                 n = sizes[k]
-                score_one3(s, n, p1t, p2t, aligned, &p1cards, &p2cards, &drawcards, &p1tricks, &p2tricks)
+                score_one3(s, n, p1t, p2t, aligned, &p1cards, &p2cards, &drawcards, &p1tricks, &p2tricks, <NoTrace*>NULL, 0, 0)
 
                 if score_by_cards:
                     if p1cards > p2cards:
@@ -998,7 +1012,7 @@ def winner_counts_for_pair(list decks_bytes, str p1, str p2, bint aligned=False,
             for k in range(m):
                 s = ptrs[k]
                 n = sizes[k]
-                score_one4(s, n, p1t, p2t, aligned, &p1cards, &p2cards, &drawcards, &p1tricks, &p2tricks)
+                score_one4(s, n, p1t, p2t, aligned, &p1cards, &p2cards, &drawcards, &p1tricks, &p2tricks, <NoTrace*>NULL, 0, 0)
 
                 if score_by_cards:
                     if p1cards > p2cards:
@@ -1019,3 +1033,139 @@ def winner_counts_for_pair(list decks_bytes, str p1, str p2, bint aligned=False,
     free(sizes)
 
     return np.array([c0, c1, c2], dtype=np.int64)
+
+
+def outcomes_for_pair(list decks_bytes, str p1, str p2, bint aligned=False, bint score_by_tricks=True):
+    """
+    same inputs as `winner_counts_for_pair`, but keeps the result of every deck instead of
+    only the aggregate counts.
+
+    returns a tuple of (outcomes, margins):
+        outcomes: int8 array, 1 where p1 won the deck, -1 where p2 won, 0 for a draw
+        margins: int16 array of p1's score minus p2's score (tricks or cards)
+    """
+    cdef bytes p1b = p1.encode("ascii")
+    cdef bytes p2b = p2.encode("ascii")
+    cdef Py_ssize_t w1 = PyBytes_GET_SIZE(p1b)
+
+    cdef const uint8_t* p1s = <const uint8_t*> PyBytes_AS_STRING(p1b)
+    cdef const uint8_t* p2s = <const uint8_t*> PyBytes_AS_STRING(p2b)
+
+    cdef uint32_t p1t
+    cdef uint32_t p2t
+    if w1 == 3:
+        p1t = pack3(p1s, 0)
+        p2t = pack3(p2s, 0)
+    else:
+        p1t = pack4(p1s, 0)
+        p2t = pack4(p2s, 0)
+
+    cdef Py_ssize_t k, m = len(decks_bytes)
+    out_arr = np.empty(m, dtype=np.int8)
+    margin_arr = np.empty(m, dtype=np.int16)
+    cdef cnp.int8_t[::1] out = out_arr
+    cdef cnp.int16_t[::1] margins = margin_arr
+    cdef bytes db
+    cdef const uint8_t** ptrs = NULL
+    cdef Py_ssize_t* sizes = NULL
+    cdef long p1cards, p2cards, drawcards
+    cdef long p1tricks, p2tricks
+    cdef long diff
+
+    ptrs = <const uint8_t**>malloc(m * sizeof(const uint8_t*))
+    sizes = <Py_ssize_t*>malloc(m * sizeof(Py_ssize_t))
+    if ptrs == NULL or sizes == NULL:
+        if ptrs != NULL:
+            free(ptrs)
+        if sizes != NULL:
+            free(sizes)
+        raise MemoryError()
+
+    for k in range(m):
+        db = <bytes>decks_bytes[k]
+        ptrs[k] = <const uint8_t*>PyBytes_AS_STRING(db)
+        sizes[k] = PyBytes_GET_SIZE(db)
+
+    with nogil:
+        for k in range(m):
+            if w1 == 3:
+                score_one3(ptrs[k], sizes[k], p1t, p2t, aligned, &p1cards, &p2cards, &drawcards, &p1tricks, &p2tricks, <NoTrace*>NULL, 0, 0)
+            else:
+                score_one4(ptrs[k], sizes[k], p1t, p2t, aligned, &p1cards, &p2cards, &drawcards, &p1tricks, &p2tricks, <NoTrace*>NULL, 0, 0)
+
+            if score_by_tricks:
+                diff = p1tricks - p2tricks
+            else:
+                diff = p1cards - p2cards
+            margins[k] = <cnp.int16_t>diff
+            if diff > 0:
+                out[k] = 1
+            elif diff < 0:
+                out[k] = -1
+            else:
+                out[k] = 0
+
+    free(ptrs)
+    free(sizes)
+
+    return out_arr, margin_arr
+
+
+cdef uint32_t _card_pattern(str p):
+    # pack a 0/1 pattern string the same way pack3/pack4 pack a row of 0/1 card values
+    cdef uint32_t word = 0
+    for ch in p:
+        word = (word << 8) | (1 if ch == "1" else 0)
+    return word
+
+
+def winner_counts_array(const uint8_t[:, ::1] cards, str p1, str p2, bint aligned=False,
+                        bint score_by_tricks=True, Py_ssize_t start=0, Py_ssize_t stop=-1) -> np.int64_t[:]:
+    """
+    same result as `winner_counts_for_pair`, but reads rows [start, stop) of a contiguous
+    (decks, deck_size) array of 0/1 cards, i.e. `Deck.array`, directly.
+
+    no bytes list or pointer table is built per call and the whole scan runs without the GIL,
+    so threads can share one array and split it by pair and by deck range.
+    """
+    cdef Py_ssize_t w1 = len(p1)
+    cdef uint32_t p1t = _card_pattern(p1)
+    cdef uint32_t p2t = _card_pattern(p2)
+    cdef Py_ssize_t n = cards.shape[1]
+    cdef Py_ssize_t k
+    cdef long c0 = 0
+    cdef long c1 = 0
+    cdef long c2 = 0
+    cdef long p1cards, p2cards, drawcards
+    cdef long p1tricks, p2tricks
+    cdef long diff
+
+    if stop < 0 or stop > cards.shape[0]:
+        stop = cards.shape[0]
+    if start < 0:
+        start = 0
+    if start >= stop:
+        return np.zeros(3, dtype=np.int64)
+
+    with nogil:
+        for k in range(start, stop):
+            if w1 == 3:
+                score_one3(&cards[k, 0], n, p1t, p2t, aligned, &p1cards, &p2cards, &drawcards, &p1tricks, &p2tricks, <NoTrace*>NULL, 0, 0)
+            else:
+                score_one4(&cards[k, 0], n, p1t, p2t, aligned, &p1cards, &p2cards, &drawcards, &p1tricks, &p2tricks, <NoTrace*>NULL, 0, 0)
+
+            if score_by_tricks:
+                diff = p1tricks - p2tricks
+            else:
+                diff = p1cards - p2cards
+            if diff > 0:
+                c0 += 1
+            elif diff < 0:
+                c1 += 1
+            else:
+                c2 += 1
+
+    return np.array([c0, c1, c2], dtype=np.int64)
+
+
+include "trace_array.pxi"
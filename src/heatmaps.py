@@ -13,7 +13,11 @@ import pandas as pd
 import matplotlib.pyplot as plt
 
 
-def make_heatmap(data, by_tricks=True, parser=None):
+def make_heatmap(data, by_tricks=True, parser=None, stderr=None, z=1.96):
+    """
+    Save the win(draw) heatmap to figures/. With `stderr` (standard error of each row's win chance,
+    e.g. `ScoreTable.std_error()[:, 0]`), cells also show the +/- half-width of their `z` interval
+    """
     data2 = []
     for p1_choice, p2_choice, p1_score, p2_score, draw in data:
         data2.append([p1_choice, p2_choice, int(p1_score), int(p2_score), int(draw)])
@@ -37,6 +41,7 @@ def make_heatmap(data, by_tricks=True, parser=None):
             "My Choice": [x.translate(trans) for x in data_np[:, 0]],
             "Score": p1_win_chance * 100,
             "Draw": draw_chance * 100,
+            "Error": np.nan if stderr is None else z * np.asarray(stderr, dtype=np.float64) * 100,
         }
     )
 
@@ -48,11 +53,15 @@ def make_heatmap(data, by_tricks=True, parser=None):
     score_str = heat.round(0).astype("Int64").astype(str).where(heat.notna(), "")
     draw_str = draw_heat.round(0).astype("Int64").astype(str).where(draw_heat.notna(), "")
     annot = (score_str + "(" + draw_str + ")").where(heat.notna(), "")
+    if stderr is not None:
+        # error bars go on a second line so cells stay readable
+        err_heat = df.pivot(index="Opponent Choice", columns="My Choice", values="Error")
+        annot = (annot + "\n±" + err_heat.round(1).astype(str)).where(heat.notna(), "")
 
     fig_size = 12
     n_cells = max(int(heat.shape[0]), int(heat.shape[1]), 1)
     cell_inches = fig_size / n_cells
-    annot_fontsize = max(6, min(20, cell_inches * 12))
+    annot_fontsize = max(6, min(20, cell_inches * (12 if stderr is None else 8)))
 
     _, ax = plt.subplots(figsize=(fig_size, fig_size))
     ax = sns.heatmap(heat, annot=annot, cmap="Blues", fmt="", ax=ax, annot_kws={"fontsize": annot_fontsize})
@@ -76,3 +85,39 @@ def make_heatmap(data, by_tricks=True, parser=None):
     plt.xlabel("My Choice")
     plt.ylabel("Opponent Choice")
     plt.savefig(f"figures/{'tricks' if by_tricks else 'cards'}_heatmap", dpi=300)
+    # figures are redrawn during long runs, don't keep every one alive
+    plt.close("all")
+
+
+def text_heatmap(data, by_tricks=True, z=1.96, stderr=None):
+    """
+    Text version of `make_heatmap` for showing partial results in the TUI.
+
+    Each cell is my win chance in percent with the +/- half-width of its `z` confidence interval
+    (normal approximation), computed straight from the running score rows unless `stderr` gives
+    the standard error of every row's win chance (for antithetic or stratified decks).
+    """
+    if len(data) == 0:
+        return ""
+    trans = "".maketrans("01", "BR")
+    p1 = [str(row[0]).translate(trans) for row in data]
+    p2 = [str(row[1]).translate(trans) for row in data]
+    scores = np.array([row[2:5] for row in data], dtype=np.int64)
+    n = scores.sum(axis=1)
+    win = scores[:, 0] / np.maximum(n, 1)
+    if stderr is None:
+        half = z * np.sqrt(win * (1 - win) / np.maximum(n, 1))
+    else:
+        half = z * np.asarray(stderr, dtype=np.float64)
+
+    labels = sorted(set(p1) | set(p2))
+    cells = {(a, b): f"{w * 100:.0f}±{h * 100:.1f}" for a, b, w, h in zip(p1, p2, win, half)}
+    width = max(len(c) for c in cells.values()) + 1
+    header = " " * (len(labels[0]) + 1) + "".join(f"{label:>{width}}" for label in labels)
+    lines = [
+        f"My Chance of Win By {'Tricks' if by_tricks else 'Cards'}, N = {int(n.max()):_} (rows: opponent, columns: me)",
+        header,
+    ]
+    for opp in labels:
+        lines.append(f"{opp} " + "".join(f"{cells.get((me, opp), '-'):>{width}}" for me in labels))
+    return "\n".join(lines)
@@ -0,0 +1,281 @@
+from __future__ import annotations
+import numpy as np
+
+# Pure NumPy versions of the fastmatch kernels. Much slower than the compiled scanners, but they need
+# no compiler, so they are the last-resort fallback and a cross-check oracle for fastmatch/fastmatch_simd.
+
+_BATCH_DECKS = 1 << 16  # bound the temporary (decks, cards) arrays
+
+# one record per trick, written by `trace_array` here and by the compiled one that fastmatch and
+# fastmatch_simd include from trace_array.pxi
+TRACE_DTYPE = np.dtype(
+    [("deck", "<i8"), ("trick", "<u2"), ("position", "<u2"), ("winner", "i1"), ("cards", "<u2")]
+)
+
+
+def _pattern_code(p: str) -> int:
+    return int(p, 2)
+
+
+def _window_codes(cards: np.ndarray, width: int) -> np.ndarray:
+    """Code of every `width`-card window, shape (decks, deck_size - width + 1)"""
+    n_windows = cards.shape[1] - width + 1
+    codes = np.zeros((cards.shape[0], n_windows), dtype=np.uint8)
+    for j in range(width):
+        codes <<= 1
+        codes |= cards[:, j : j + n_windows]
+    return codes
+
+
+def _next_hit(hits: np.ndarray, deck_size: int) -> np.ndarray:
+    """
+    For every deck and start position, the first window at or after it that is a hit.
+
+    Shape (decks, deck_size + 1); positions with no later hit hold deck_size.
+    """
+    m, n_windows = hits.shape
+    nxt = np.full((m, deck_size + 1), deck_size, dtype=np.int32)
+    nxt[:, :n_windows] = np.where(hits, np.arange(n_windows, dtype=np.int32), deck_size)
+    # suffix minimum, done as a prefix minimum over the reversed rows
+    np.minimum.accumulate(nxt[:, ::-1], axis=1, out=nxt[:, ::-1])
+    return nxt
+
+
+def score_cards(
+    cards: np.ndarray, p1: str, p2: str, aligned: bool = False
+) -> tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Play every deck in a (decks, deck_size) array of 0/1 cards in lockstep.
+
+    Returns (p1cards, p2cards, p1tricks, p2tricks) as int64 arrays, one entry per deck.
+    """
+    m, n = cards.shape
+    width = len(p1)
+    p1cards = np.zeros(m, dtype=np.int64)
+    p2cards = np.zeros(m, dtype=np.int64)
+    p1tricks = np.zeros(m, dtype=np.int64)
+    p2tricks = np.zeros(m, dtype=np.int64)
+    if n < width or m == 0:
+        return p1cards, p2cards, p1tricks, p2tricks
+
+    codes = _window_codes(cards, width)
+    hit1 = codes == _pattern_code(p1)
+    hit2 = codes == _pattern_code(p2)
+    if aligned:
+        # every trick ends on a multiple of `width`, so aligned starts stay at offsets divisible by it
+        off_grid = (np.arange(codes.shape[1]) % width) != 0
+        hit1[:, off_grid] = False
+        hit2[:, off_grid] = False
+    nxt = _next_hit(hit1 | hit2, n)
+
+    rows = np.arange(m)
+    offset = np.zeros(m, dtype=np.int64)
+    while rows.size:
+        pos = nxt[rows, offset[rows]]
+        found = pos < n
+        rows, pos = rows[found], pos[found]
+        if not rows.size:
+            break
+        won = pos - offset[rows] + width
+        by_p1 = hit1[rows, pos]
+        p1_rows, p2_rows = rows[by_p1], rows[~by_p1]
+        p1cards[p1_rows] += won[by_p1]
+        p1tricks[p1_rows] += 1
+        p2cards[p2_rows] += won[~by_p1]
+        p2tricks[p2_rows] += 1
+        offset[rows] = pos + width
+    return p1cards, p2cards, p1tricks, p2tricks
+
+
+def _cards_from_bytes(decks_bytes: list[bytes]) -> np.ndarray:
+    if not decks_bytes:
+        return np.empty((0, 0), dtype=np.uint8)
+    raw = np.frombuffer(b"".join(decks_bytes), dtype=np.uint8)
+    return raw.reshape(len(decks_bytes), len(decks_bytes[0])) - ord("0")
+
+
+def _margins(cards: np.ndarray, p1: str, p2: str, aligned: bool, score_by_tricks: bool) -> np.ndarray:
+    out = np.empty(cards.shape[0], dtype=np.int64)
+    for start in range(0, cards.shape[0], _BATCH_DECKS):
+        p1cards, p2cards, p1tricks, p2tricks = score_cards(cards[start : start + _BATCH_DECKS], p1, p2, aligned)
+        out[start : start + _BATCH_DECKS] = (p1tricks - p2tricks) if score_by_tricks else (p1cards - p2cards)
+    return out
+
+
+def winner_counts_array(
+    cards: np.ndarray,
+    p1: str,
+    p2: str,
+    aligned: bool = False,
+    score_by_tricks: bool = True,
+    start: int = 0,
+    stop: int = -1,
+) -> np.ndarray:
+    """Same result as `winner_counts_for_pair`, from rows [start, stop) of a (decks, deck_size) array of 0/1 cards"""
+    if stop < 0 or stop > cards.shape[0]:
+        stop = cards.shape[0]
+    diff = _margins(cards[max(start, 0) : stop], p1, p2, aligned, score_by_tricks)
+    return np.array(
+        [np.count_nonzero(diff > 0), np.count_nonzero(diff < 0), np.count_nonzero(diff == 0)], dtype=np.int64
+    )
+
+
+def winner_counts_for_pair(
+    decks_bytes: list[bytes], p1: str, p2: str, aligned: bool = False, score_by_tricks: bool = True
+) -> np.ndarray:
+    """
+    Drop-in replacement for `fastmatch.winner_counts_for_pair`.
+
+    returns an array of [count_p1, count_p2, count_draw] as int64s
+    """
+    return winner_counts_array(_cards_from_bytes(decks_bytes), p1, p2, aligned, score_by_tricks)
+
+
+def outcomes_for_pair(
+    decks_bytes: list[bytes], p1: str, p2: str, aligned: bool = False, score_by_tricks: bool = True
+) -> tuple[np.ndarray, np.ndarray]:
+    """Drop-in replacement for `fastmatch.outcomes_for_pair`"""
+    diff = _margins(_cards_from_bytes(decks_bytes), p1, p2, aligned, score_by_tricks)
+    return np.sign(diff).astype(np.int8), diff.astype(np.int16)
+
+
+def build_next_tables(cards: np.ndarray, bits: int, aligned: bool = False) -> np.ndarray:
+    """Drop-in replacement for `fastmatch.build_next_tables`"""
+    m, n = cards.shape
+    if n > 254:
+        raise ValueError("next-occurrence tables hold uint8 positions, so decks are limited to 254 cards")
+    tables = np.full((m, n + 1, 2**bits), n, dtype=np.uint8)
+    if n < bits:
+        return tables
+    codes = _window_codes(cards, bits)
+    if aligned:
+        codes = np.where((np.arange(codes.shape[1]) % bits) == 0, codes, 2**bits)
+    for code in range(2**bits):
+        tables[:, :, code] = _next_hit(codes == code, n)
+    return tables
+
+
+def _play_tables(tables: np.ndarray, p1: str, p2: str, start: int, stop: int) -> tuple[np.ndarray, np.ndarray]:
+    """Per-deck (trick margin, card margin) of p1 over p2 from rows [start, stop) of next-occurrence tables"""
+    if len(p1) != len(p2):
+        raise ValueError(f"patterns {p1!r} and {p2!r} differ in length")
+    if tables.shape[2] != 1 << len(p1):
+        raise ValueError(
+            f"{len(p1)}-card patterns need tables built with bits={len(p1)}, "
+            f"these hold {tables.shape[2]} pattern columns"
+        )
+    if stop < 0 or stop > tables.shape[0]:
+        stop = tables.shape[0]
+    tables = tables[max(start, 0) : stop]
+    m, n = tables.shape[0], tables.shape[1] - 1
+    width = len(p1)
+    c1, c2 = _pattern_code(p1), _pattern_code(p2)
+    p1cards = np.zeros(m, dtype=np.int64)
+    p2cards = np.zeros(m, dtype=np.int64)
+    p1tricks = np.zeros(m, dtype=np.int64)
+    p2tricks = np.zeros(m, dtype=np.int64)
+    rows = np.arange(m)
+    offset = np.zeros(m, dtype=np.int64)
+    while rows.size:
+        a = tables[rows, offset[rows], c1].astype(np.int64)
+        b = tables[rows, offset[rows], c2].astype(np.int64)
+        found = np.minimum(a, b) < n
+        rows, a, b = rows[found], a[found], b[found]
+        by_p1 = a < b
+        pos = np.where(by_p1, a, b)
+        won = pos - offset[rows] + width
+        p1cards[rows[by_p1]] += won[by_p1]
+        p1tricks[rows[by_p1]] += 1
+        p2cards[rows[~by_p1]] += won[~by_p1]
+        p2tricks[rows[~by_p1]] += 1
+        offset[rows] = pos + width
+    return p1tricks - p2tricks, p1cards - p2cards
+
+
+def winner_counts_tables(tables: np.ndarray, p1: str, p2: str, start: int = 0, stop: int = -1) -> np.ndarray:
+    """Drop-in replacement for `fastmatch.winner_counts_tables`"""
+    out = np.empty((2, 3), dtype=np.int64)
+    for row, diff in enumerate(_play_tables(tables, p1, p2, start, stop)):
+        out[row] = (np.count_nonzero(diff > 0), np.count_nonzero(diff < 0), np.count_nonzero(diff == 0))
+    return out
+
+
+def outcomes_tables(tables: np.ndarray, p1: str, p2: str, start: int = 0, stop: int = -1) -> np.ndarray:
+    """Drop-in replacement for `fastmatch.outcomes_tables`"""
+    return np.sign(np.stack(_play_tables(tables, p1, p2, start, stop))).astype(np.int8)
+
+
+def margins_tables(tables: np.ndarray, p1: str, p2: str, start: int = 0, stop: int = -1) -> np.ndarray:
+    """Drop-in replacement for `fastmatch.margins_tables`"""
+    return np.stack(_play_tables(tables, p1, p2, start, stop)).astype(np.int16)
+
+
+def trace_events(cards: np.ndarray, p1: str, p2: str, aligned: bool = False, deck_offset: int = 0) -> np.ndarray:
+    """
+    Every trick of every deck as `TRACE_DTYPE` records, ordered by deck then trick.
+
+    `position` is where the winning pattern starts, `winner` is 1 for p1 and -1 for p2, and
+    `cards` is the number of cards the trick took. Decks are numbered from `deck_offset`.
+    """
+    m, n = cards.shape
+    width = len(p1)
+    if n < width or m == 0:
+        return np.empty(0, dtype=TRACE_DTYPE)
+    codes = _window_codes(cards, width)
+    hit1 = codes == _pattern_code(p1)
+    hit2 = codes == _pattern_code(p2)
+    if aligned:
+        off_grid = (np.arange(codes.shape[1]) % width) != 0
+        hit1[:, off_grid] = False
+        hit2[:, off_grid] = False
+    nxt = _next_hit(hit1 | hit2, n)
+
+    parts = []
+    rows = np.arange(m)
+    offset = np.zeros(m, dtype=np.int64)
+    trick = 0
+    while rows.size:
+        pos = nxt[rows, offset[rows]]
+        found = pos < n
+        rows, pos = rows[found], pos[found]
+        if not rows.size:
+            break
+        part = np.empty(rows.size, dtype=TRACE_DTYPE)
+        part["deck"] = rows + deck_offset
+        part["trick"] = trick
+        part["position"] = pos
+        part["winner"] = np.where(hit1[rows, pos], 1, -1)
+        part["cards"] = pos - offset[rows] + width
+        parts.append(part)
+        offset[rows] = pos + width
+        trick += 1
+    if not parts:
+        return np.empty(0, dtype=TRACE_DTYPE)
+    events = np.concatenate(parts)
+    return events[np.argsort(events["deck"], kind="stable")]
+
+
+def trace_array(
+    cards: np.ndarray,
+    p1: str,
+    p2: str,
+    events: np.ndarray,
+    aligned: bool = False,
+    start: int = 0,
+    stop: int = -1,
+    deck_offset: int = 0,
+) -> tuple[int, int]:
+    """Drop-in replacement for `fastmatch.trace_array`"""
+    if stop < 0 or stop > cards.shape[0]:
+        stop = cards.shape[0]
+    start = max(start, 0)
+    if len(events) < cards.shape[1] // len(p1):
+        raise ValueError("event buffer is smaller than the most tricks one deck can have")
+    # a deck's tricks never exceed deck_size // width, so this many decks always fit
+    stop = min(stop, start + max(1, len(events) // max(1, cards.shape[1] // len(p1))))
+    traced = trace_events(cards[start:stop], p1, p2, aligned, deck_offset + start)
+    per_deck = np.bincount(traced["deck"] - deck_offset - start, minlength=stop - start)
+    fits = int(np.searchsorted(np.cumsum(per_deck), len(events), side="right"))
+    count = int(per_deck[:fits].sum())
+    events[:count] = traced[:count]
+    return start + fits, count
@@ -0,0 +1,71 @@
+from __future__ import annotations
+import os
+import sys
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+
+try:
+    from src.fastmatch import build_next_tables
+except Exception:
+    from src.npmatch import build_next_tables
+
+# Thread pools shared by scoring (parser), variance, per-deck results and deck folder I/O.
+# The kernels, packbits/unpackbits, crc32 and file reads all release the GIL, so plain threads
+# overlap them and every task can read the one shared card array.
+
+_TABLE_BLOCK = 1 << 16  # most decks per next-occurrence table block
+_TABLE_BYTES = 256 << 20  # most table memory alive at once, summed over every thread
+
+
+def free_threaded() -> bool:
+    """True when running on a free-threaded (no-GIL) interpreter"""
+    is_gil_enabled = getattr(sys, "_is_gil_enabled", None)
+    return is_gil_enabled is not None and not is_gil_enabled()
+
+
+def resolve_workers(workers: int | None = None) -> int:
+    """`workers`, defaulting to one per CPU"""
+    if workers is None:
+        workers = os.cpu_count() or 1
+    return max(1, workers)
+
+
+def thread_map(fn, items: list, workers: int | None = None, name: str = "penney") -> list:
+    """Run `fn` over `items` on a thread pool of at most `workers` threads, keeping the input order"""
+    workers = min(resolve_workers(workers), max(1, len(items)))
+    if workers == 1:
+        return [fn(item) for item in items]
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix=name) as executor:
+        return list(executor.map(fn, items))
+
+
+def table_block(num_decks: int, deck_size: int, bits: int, workers: int) -> int:
+    """
+    Decks per next-occurrence table block when `workers` threads each hold one block.
+
+    A table takes (deck_size + 1) * 2**bits bytes per deck (about 850 bytes at 4 bits and 52 cards),
+    so the block shrinks with more threads to keep the total under `_TABLE_BYTES`.
+    """
+    per_deck = (deck_size + 1) * 2**bits
+    budget = max(1, _TABLE_BYTES // (max(1, workers) * per_deck))
+    return max(1, min(_TABLE_BLOCK, budget, -(-num_decks // max(1, workers))))
+
+
+def map_table_blocks(
+    fn, cards: np.ndarray, bits: int, workers: int | None = None, even: bool = False, name: str = "penney-tables"
+) -> list:
+    """
+    Split a (decks, deck_size) card array into `table_block`-sized blocks, build each block's
+    next-occurrence tables on a worker thread and return `fn(tables, start)` for every block in order.
+
+    `even` rounds the block up to an even size so antithetic pairs never straddle two blocks.
+    """
+    workers = resolve_workers(workers)
+    block = table_block(len(cards), cards.shape[1], bits, workers)
+    if even:
+        block += block % 2
+
+    def _run(start: int):
+        return fn(build_next_tables(cards[start : start + block], bits), start)
+
+    return thread_map(_run, list(range(0, len(cards), block)), workers, name)
@@ -0,0 +1,187 @@
+from __future__ import annotations
+import numpy as np
+import re
+from typing import Literal, Tuple
+from src.decks import Deck, deck_gen
+from src import npmatch
+
+try:
+    from src.fastmatch_simd import winner_counts_array
+except Exception:
+    try:
+        from src.fastmatch import winner_counts_array
+    except Exception:
+        from src.npmatch import winner_counts_array
+try:
+    from src.fastmatch import winner_counts_tables
+except Exception:
+    from src.npmatch import winner_counts_tables
+from src.parallel import free_threaded, map_table_blocks, resolve_workers, thread_map
+from itertools import permutations
+
+
+def score_counts(cards: np.ndarray, pairs: list, score_by_tricks: bool = True, workers: int | None = None) -> np.ndarray:
+    """
+    Score every pair in `pairs` on a (decks, deck_size) array of 0/1 cards.
+
+    All threads share the one card array. Work is split by pair and, when there are more
+    workers than pairs or the interpreter is free-threaded, also by deck range, so every core
+    gets a similar share. The kernels scan without the GIL.
+
+    Returns an int64 array shaped (pairs, 3) of [p1 wins, p2 wins, draws].
+    """
+    out = np.zeros((len(pairs), 3), dtype=np.int64)
+    if len(cards) == 0 or not pairs:
+        return out
+    cards = np.ascontiguousarray(cards, dtype=np.uint8)
+    workers = resolve_workers(workers)
+
+    deck_parts = -(-workers // len(pairs))
+    if free_threaded():
+        # finer tasks even out per-thread load, the no-GIL interpreter has no lock to contend on
+        deck_parts = max(deck_parts, 2)
+    deck_parts = max(1, min(deck_parts, len(cards)))
+    bounds = np.linspace(0, len(cards), deck_parts + 1, dtype=np.int64)
+    tasks = [(idx, int(bounds[part]), int(bounds[part + 1])) for idx in range(len(pairs)) for part in range(deck_parts)]
+
+    def _score(task):
+        idx, start, stop = task
+        p1, p2 = pairs[idx]
+        return idx, winner_counts_array(cards, p1, p2, aligned=False, score_by_tricks=score_by_tricks, start=start, stop=stop)
+
+    # merged on the calling thread since tasks for the same pair finish on different threads
+    for idx, counts in thread_map(_score, tasks, workers, "penney-parser"):
+        out[idx] += counts
+    return out
+
+
+def score_counts_both(cards: np.ndarray, pairs: list, workers: int | None = None) -> np.ndarray:
+    """
+    Score every pair in `pairs` by tricks and by cards at once.
+
+    Each thread builds the next-occurrence tables for one block of decks (see
+    `fastmatch.build_next_tables`) and reuses them for every pair and both scoring methods, so a
+    trick costs two table lookups instead of a scan of the deck. Blocks are sized by
+    `parallel.table_block`, which bounds the table memory of all threads together.
+
+    Returns an int64 array shaped (2, pairs, 3): counts by tricks, then counts by cards.
+    """
+    out = np.zeros((2, len(pairs), 3), dtype=np.int64)
+    if len(cards) == 0 or not pairs:
+        return out
+    cards = np.ascontiguousarray(cards, dtype=np.uint8)
+    bits = len(pairs[0][0])
+    if cards.shape[1] > 254:
+        # tables store uint8 positions, fall back to one scan per scoring method
+        out[0] = score_counts(cards, pairs, True, workers)
+        out[1] = score_counts(cards, pairs, False, workers)
+        return out
+
+    def _score(tables, start):
+        return np.stack([winner_counts_tables(tables, p1, p2) for p1, p2 in pairs], axis=1)
+
+    for counts in map_table_blocks(_score, cards, bits, workers, name="penney-parser"):
+        out += counts
+    return out
+
+
+class Parser:
+    """Parse deck list and get scores for each round"""
+
+    __slots__ = ("decks", "_counts", "bits", "scoring")
+
+    def __init__(self, decks: Deck, bits: Literal[3, 4], scoring_by_tricks: bool = True) -> None:
+        """Create a parser object for a Deck object
+
+        params:
+                decks: Deck object to parse
+                bits: Whether to run the 3 or 4 bit game
+                scoring_by_tricks: Whether or not to score by tricks won or total cards won
+
+        """
+        self.decks = decks
+        self._counts = None
+        self.bits = bits
+        self.scoring = scoring_by_tricks
+        return
+
+    @property
+    def player_options(self):
+        # Deterministic ordering is important: cached score rows must line up with
+        # Parser.pairs order across runs.
+        return [str(bin(w))[2:].zfill(self.bits) for w in range(2**self.bits)]
+
+    @property
+    def pairs(self):
+        return list(permutations(self.player_options, 2))
+
+    @property
+    def counts(self) -> np.ndarray | None:
+        """Score matrix shaped (pairs, 3) of [p1 wins, p2 wins, draws] in `pairs` order"""
+        return self._counts
+
+    @property
+    def scores(self) -> list:
+        """Scores as rows of [p1, p2, win, loss, tie]"""
+        if self._counts is None:
+            return []
+        return [[p1, p2, int(w), int(l), int(t)] for (p1, p2), (w, l, t) in zip(self.pairs, self._counts.tolist())]
+
+    @scores.setter
+    def scores(self, rows) -> None:
+        if rows is None or len(rows) == 0:
+            self._counts = None
+            return
+        pairs = self.pairs
+        if len(rows) != len(pairs):
+            raise ValueError("Score rows are misaligned with the parser's pairs.")
+        counts = np.empty((len(pairs), 3), dtype=np.int64)
+        for idx, (row, pair) in enumerate(zip(rows, pairs)):
+            if (str(row[0]), str(row[1])) != pair:
+                raise ValueError("Score rows are misaligned with the parser's pairs.")
+            counts[idx] = (int(row[2]), int(row[3]), int(row[4]))
+        self._counts = counts
+
+    def winner2(self, p1, p2) -> np.ndarray:
+        """
+        Reference scorer in pure NumPy (see `src.npmatch`); same [win, loss, tie]
+        counts as `winner`, useful as a cross-check for the compiled kernels
+        """
+        return npmatch.winner_counts_array(self.decks.array, p1, p2, aligned=False, score_by_tricks=self.scoring)
+
+    def winner(self, p1, p2) -> list:
+        return list(winner_counts_array(self.decks.array, p1, p2, aligned=False, score_by_tricks=self.scoring))
+
+    def raw_out(self) -> list:
+        """Output data as Tuple of str and numpy array"""
+        self._counts = score_counts(self.decks.array, self.pairs, self.scoring)
+        return self.scores
+
+    def add_decks(self, deck_count: int, decks=None) -> Parser:
+        """
+        generate deck_count additional decks (or use provided decks),
+        score them, and update the parser
+        """
+        if decks is None:
+            new_decks = deck_gen(num_decks=deck_count)
+        else:
+            if isinstance(decks, Deck):
+                new_decks = decks
+            elif isinstance(decks, list):
+                new_decks = Deck(decks=decks)
+            else:
+                raise TypeError("decks must be a Deck or list[str]")
+
+        counts = self._counts
+        if counts is None:
+            # never scored: count the decks already held so totals cover every deck
+            counts = score_counts(self.decks.array, self.pairs, self.scoring)
+        # only the new batch is scored; extend checks the deck size, so counts change only once it succeeds
+        batch = score_counts(new_decks.array, self.pairs, self.scoring)
+        self.decks.extend(new_decks)
+        self._counts = counts + batch
+        return self.scores
+
+    # backward compatibility
+    def rawOut(self) -> list:
+        return self.raw_out()
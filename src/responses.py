@@ -0,0 +1,125 @@
+from __future__ import annotations
+from itertools import permutations
+import numpy as np
+import pandas as pd
+from src.decks import deck_gen
+from src.parser import score_counts_both
+
+
+def _opposite(x: str) -> str:
+    return "1" if x == "0" else "0"
+
+
+def _majority(*xs: str) -> str:
+    return "1" if sum(x == "1" for x in xs) * 2 > len(xs) else "0"
+
+
+def trick_rule(p1: str) -> str:
+    """README rule for tricks: opposite(x2), then x1 ... x(n-1)"""
+    return _opposite(p1[1]) + p1[:-1]
+
+
+def card_rule(p1: str) -> str | None:
+    """README rule for cards: opposite(M), majority(x1, x2, opposite(x3)), M. Only defined for 3 bits"""
+    if len(p1) != 3:
+        return None
+    m = _majority(*p1)
+    return _opposite(m) + _majority(p1[0], p1[1], _opposite(p1[2])) + m
+
+
+class ResponseSearch:
+    """
+    Best second-player responses across deck sizes, bit counts and both scoring rules.
+
+    Each batch of decks is generated once per deck size and scored for every bit count and
+    both scoring rules, then dropped: only the counts are cached, so growing the sample only
+    scores the new decks and memory does not grow with it.
+    """
+
+    def __init__(self, deck_sizes=range(10, 105, 2), bits=(3, 4), z: float = 1.96) -> None:
+        self.deck_sizes = [int(d) for d in deck_sizes]
+        if any(d % 2 for d in self.deck_sizes):
+            raise ValueError("Deck size must be divisible by 2")
+        self.bits = tuple(bits)
+        self.z = z
+        # (deck_size, bits) -> int64 (2, pairs, 3): counts by tricks, then by cards
+        self._counts: dict[tuple[int, int], np.ndarray] = {}
+
+    @staticmethod
+    def pairs(bits: int) -> list[tuple[str, str]]:
+        player_options = [str(bin(w))[2:].zfill(bits) for w in range(2**bits)]
+        return list(permutations(player_options, 2))
+
+    def add_decks(self, num_decks: int, workers: int | None = None) -> None:
+        """Generate `num_decks` more decks for every deck size and score only those"""
+        for size in self.deck_sizes:
+            new_decks = deck_gen(num_decks=num_decks, deck_size=size)
+            for bits in self.bits:
+                counts = score_counts_both(new_decks.array, self.pairs(bits), workers=workers)
+                if (size, bits) in self._counts:
+                    self._counts[(size, bits)] += counts
+                else:
+                    self._counts[(size, bits)] = counts
+
+    def counts(self, deck_size: int, bits: int, by_tricks: bool = True) -> np.ndarray:
+        """(pairs, 3) counts for one configuration"""
+        return self._counts[(deck_size, bits)][0 if by_tricks else 1]
+
+    def best_responses(self, deck_size: int, bits: int, by_tricks: bool = True) -> pd.DataFrame:
+        """
+        For every p1 choice, the p2 choice that wins most often, with `z` confidence bounds on
+        its win chance, and how the README rule's choice compares
+        """
+        counts = self.counts(deck_size, bits, by_tricks)
+        pairs = self.pairs(bits)
+        n = np.maximum(counts.sum(axis=1), 1)
+        p2_win = counts[:, 1] / n
+        half = self.z * np.sqrt(p2_win * (1 - p2_win) / n)
+        rule = trick_rule if by_tricks else card_rule
+
+        rows = []
+        for p1 in sorted({a for a, _ in pairs}):
+            idx = [i for i, (a, _) in enumerate(pairs) if a == p1]
+            best = max(idx, key=lambda i: p2_win[i])
+            runner_up = max((i for i in idx if i != best), key=lambda i: p2_win[i])
+            rule_p2 = rule(p1)
+            rule_idx = next((i for i in idx if pairs[i][1] == rule_p2), None)
+            row = {
+                "deck_size": deck_size,
+                "bits": bits,
+                "scoring": "tricks" if by_tricks else "cards",
+                "p1": p1,
+                "best_p2": pairs[best][1],
+                "best_win": p2_win[best],
+                "best_lo": p2_win[best] - half[best],
+                "best_hi": p2_win[best] + half[best],
+                # the best choice is only clear when its interval doesn't overlap the runner-up's
+                "clear": p2_win[best] - half[best] > p2_win[runner_up] + half[runner_up],
+                "rule_p2": rule_p2,
+                "rule_win": np.nan if rule_idx is None else p2_win[rule_idx],
+                "rule_ok": rule_idx is not None and rule_idx == best,
+                # rule is significantly worse than the best response, not just behind by noise
+                "rule_breaks": rule_idx is not None
+                and p2_win[rule_idx] + half[rule_idx] < p2_win[best] - half[best],
+                "n": int(n[best]),
+            }
+            rows.append(row)
+        return pd.DataFrame(rows)
+
+    def sweep(self) -> pd.DataFrame:
+        """Best responses for every cached deck size, bit count and scoring rule"""
+        frames = [
+            self.best_responses(size, bits, by_tricks)
+            for size in self.deck_sizes
+            for bits in self.bits
+            for by_tricks in (True, False)
+            if (size, bits) in self._counts
+        ]
+        return pd.concat(frames, ignore_index=True) if frames else pd.DataFrame()
+
+    def breaks(self) -> pd.DataFrame:
+        """Configurations where a README rule is significantly worse than the best response"""
+        df = self.sweep()
+        if df.empty:
+            return df
+        return df[df["rule_breaks"]].reset_index(drop=True)
@@ -0,0 +1,228 @@
+from __future__ import annotations
+import os
+import json
+from itertools import permutations
+from pathlib import Path
+import numpy as np
+
+try:
+    from src.fastmatch_simd import outcomes_for_pair
+except Exception:
+    try:
+        from src.fastmatch import outcomes_for_pair
+    except Exception:
+        from src.npmatch import outcomes_for_pair
+try:
+    from src.fastmatch import margins_tables
+except Exception:
+    from src.npmatch import margins_tables
+from src.parallel import map_table_blocks
+
+WIN = 1
+LOSS = -1
+TIE = 0
+
+_RESULT_STORE_VERSION = 1
+
+
+def _result_dir(deck_folder: str | Path, bits: int, by_tricks: bool) -> Path:
+    return Path(deck_folder) / f"results_bits{bits}_{'tricks' if by_tricks else 'cards'}"
+
+
+def _pair_list(bits: int) -> list[tuple[str, str]]:
+    # same order as Parser.pairs so rows line up with score tables
+    player_options = [str(bin(w))[2:].zfill(bits) for w in range(2**bits)]
+    return list(permutations(player_options, 2))
+
+
+def score_outcomes(
+    decks_bytes: list[bytes], bits: int, score_by_tricks: bool = True
+) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Score every pair on every deck.
+
+    Returns (outcomes, margins), both shaped (pairs, decks) so each pair is one contiguous column.
+    """
+    pairs = _pair_list(bits)
+    outcomes = np.empty((len(pairs), len(decks_bytes)), dtype=np.int8)
+    margins = np.empty((len(pairs), len(decks_bytes)), dtype=np.int16)
+    for idx, (p1, p2) in enumerate(pairs):
+        outcomes[idx], margins[idx] = outcomes_for_pair(
+            decks_bytes, p1, p2, aligned=False, score_by_tricks=score_by_tricks
+        )
+    return outcomes, margins
+
+
+def score_results_both(
+    cards: np.ndarray, bits: int, workers: int | None = None
+) -> list[tuple[np.ndarray, np.ndarray]]:
+    """
+    Score every pair on every deck of a (decks, deck_size) card array, by tricks and by cards at once.
+
+    Each thread builds next-occurrence tables for one block of decks and reads both methods' margins
+    for every pair from them, so the decks are walked once instead of once per pair and method.
+
+    Returns [(outcomes, margins) by tricks, (outcomes, margins) by cards], shaped like `score_outcomes`.
+    """
+    cards = np.ascontiguousarray(cards, dtype=np.uint8)
+    pairs = _pair_list(bits)
+    margins = np.empty((2, len(pairs), len(cards)), dtype=np.int16)
+    if cards.shape[1] > 254:
+        # tables store uint8 positions, fall back to scanning each method separately
+        encoded = [bytes(row + ord("0")) for row in cards]
+        return [score_outcomes(encoded, bits, by_tricks) for by_tricks in (True, False)]
+
+    def _score(tables, start):
+        for idx, (p1, p2) in enumerate(pairs):
+            margins[:, idx, start : start + len(tables)] = margins_tables(tables, p1, p2)
+
+    map_table_blocks(_score, cards, bits, workers, name="penney-results")
+    return [(np.sign(margins[m]).astype(np.int8), margins[m]) for m in range(2)]
+
+
+class ResultStore:
+    """
+    Columnar per-deck results for one (bits, scoring) combination of a deck folder.
+
+    Results live in `data/<folder>/results_bits{bits}_{tricks|cards}/` as one pair of
+    memory-mapped `outcomes_{k}.npy` / `margins_{k}.npy` files per chunk of decks, in the
+    same order the decks were appended. Outcomes are int8 (1 = p1 won, -1 = p2 won, 0 = draw)
+    and margins are p1's score minus p2's score.
+    """
+
+    __slots__ = ("path", "bits", "scoring", "pairs", "_pair_index", "_chunks")
+
+    def __init__(self, deck_folder: str | Path, bits: int, scoring_by_tricks: bool = True) -> None:
+        self.path = _result_dir(deck_folder, bits, scoring_by_tricks)
+        self.bits = bits
+        self.scoring = scoring_by_tricks
+        self.pairs = _pair_list(bits)
+        self._pair_index = {pair: idx for idx, pair in enumerate(self.pairs)}
+        self._chunks: list[tuple[np.ndarray, np.ndarray]] | None = None
+
+    @property
+    def chunk_count(self) -> int:
+        return len(self._load_metadata()["chunks"])
+
+    def __len__(self) -> int:
+        """Number of decks stored"""
+        return int(sum(self._load_metadata()["chunks"]))
+
+    def _load_metadata(self) -> dict:
+        md_path = self.path / "metadata.json"
+        if not md_path.exists():
+            return {"version": _RESULT_STORE_VERSION, "bits": self.bits, "chunks": []}
+        return json.loads(md_path.read_text())
+
+    def append(self, decks_bytes: list[bytes]) -> None:
+        """Score a batch of decks on every pair and write it as a new chunk."""
+        if not decks_bytes:
+            return
+        outcomes, margins = score_outcomes(decks_bytes, self.bits, self.scoring)
+        self.append_arrays(outcomes, margins, len(decks_bytes[0]))
+
+    def append_arrays(self, outcomes: np.ndarray, margins: np.ndarray, deck_size: int | None = None) -> None:
+        """Write already-scored (pairs, decks) outcome and margin arrays as a new chunk."""
+        if outcomes.shape != margins.shape or outcomes.shape[0] != len(self.pairs):
+            raise ValueError("Result arrays must be shaped (pairs, decks) for this bit count.")
+        # margins fit in one byte for any deck of up to 127 cards
+        if deck_size is not None and deck_size <= np.iinfo(np.int8).max:
+            margins = margins.astype(np.int8)
+        os.makedirs(self.path, exist_ok=True)
+        md = self._load_metadata()
+        k = len(md["chunks"])
+        np.save(self.path / f"outcomes_{k}.npy", np.ascontiguousarray(outcomes, dtype=np.int8))
+        np.save(self.path / f"margins_{k}.npy", np.ascontiguousarray(margins))
+        md["chunks"].append(int(outcomes.shape[1]))
+        md["pairs"] = ["".join(pair) for pair in self.pairs]
+        md["method"] = "tricks" if self.scoring else "cards"
+        # chunks only count once the metadata lists them, so swap it in whole
+        tmp = self.path / ".metadata.json.tmp"
+        with open(tmp, "w") as f:
+            json.dump(md, f)
+        os.replace(tmp, self.path / "metadata.json")
+        self._chunks = None
+
+    def _mapped(self) -> list[tuple[np.ndarray, np.ndarray]]:
+        if self._chunks is None:
+            self._chunks = [
+                (
+                    np.load(self.path / f"outcomes_{k}.npy", mmap_mode="r"),
+                    np.load(self.path / f"margins_{k}.npy", mmap_mode="r"),
+                )
+                for k in range(self.chunk_count)
+            ]
+        return self._chunks
+
+    def _index(self, p1: str, p2: str) -> int:
+        try:
+            return self._pair_index[(p1, p2)]
+        except KeyError:
+            raise KeyError(f"No results stored for pair ({p1}, {p2})") from None
+
+    def outcomes(self, p1: str, p2: str) -> np.ndarray:
+        """Per-deck outcomes of p1 against p2 across every chunk."""
+        idx = self._index(p1, p2)
+        chunks = self._mapped()
+        return np.concatenate([o[idx] for o, _ in chunks]) if chunks else np.empty(0, dtype=np.int8)
+
+    def margins(self, p1: str, p2: str) -> np.ndarray:
+        """Per-deck score margins of p1 against p2 across every chunk."""
+        idx = self._index(p1, p2)
+        chunks = self._mapped()
+        return np.concatenate([m[idx] for _, m in chunks]) if chunks else np.empty(0, dtype=np.int16)
+
+    def mask(self, conditions: list[tuple[str, str]], outcome: int = WIN) -> np.ndarray:
+        """
+        Boolean mask over all decks where every (p1, p2) in `conditions` had `outcome`.
+
+        e.g. `store.mask([("011", "100"), ("011", "110")])` selects decks where 011 beat both.
+        """
+        rows = [self._index(p1, p2) for p1, p2 in conditions]
+        parts = []
+        for o, _ in self._mapped():
+            m = np.ones(o.shape[1], dtype=bool)
+            for r in rows:
+                m &= o[r] == outcome
+            parts.append(m)
+        return np.concatenate(parts) if parts else np.empty(0, dtype=bool)
+
+    def decks_where(self, conditions: list[tuple[str, str]], outcome: int = WIN) -> np.ndarray:
+        """Deck indices matching `mask(conditions, outcome)`"""
+        return np.flatnonzero(self.mask(conditions, outcome))
+
+    def counts(self, mask: np.ndarray | None = None) -> np.ndarray:
+        """
+        W/L/T counts for every pair, optionally restricted to decks selected by `mask`.
+
+        Returns an int64 array shaped (pairs, 3) in `pairs` order.
+        """
+        totals = np.zeros((len(self.pairs), 3), dtype=np.int64)
+        start = 0
+        for o, _ in self._mapped():
+            block = o
+            if mask is not None:
+                block = o[:, mask[start : start + o.shape[1]]]
+            start += o.shape[1]
+            totals[:, 0] += np.count_nonzero(block == WIN, axis=1)
+            totals[:, 1] += np.count_nonzero(block == LOSS, axis=1)
+            totals[:, 2] += np.count_nonzero(block == TIE, axis=1)
+        return totals
+
+    def raw_out(self, mask: np.ndarray | None = None) -> list:
+        """Counts in the same row format as `Parser.raw_out()`"""
+        return [[p1, p2, int(w), int(l), int(t)] for (p1, p2), (w, l, t) in zip(self.pairs, self.counts(mask))]
+
+    def mean_margin(self, mask: np.ndarray | None = None) -> np.ndarray:
+        """Average margin of p1 over p2 for every pair"""
+        total = np.zeros(len(self.pairs), dtype=np.int64)
+        n = 0
+        start = 0
+        for _, m in self._mapped():
+            block = m
+            if mask is not None:
+                block = m[:, mask[start : start + m.shape[1]]]
+            start += m.shape[1]
+            total += block.sum(axis=1, dtype=np.int64)
+            n += block.shape[1]
+        return total / max(n, 1)
@@ -1,45 +1,306 @@
 from __future__ import annotations
 import os
+import re
 import json
+import zlib
+import struct
+import uuid
+from contextlib import contextmanager
 import numpy as np
 from src.decks import Deck
+from src.parallel import thread_map
 
-def save_decks(deck: Deck, filename: str, file_size: int = 80000000, overwrite: bool = False) -> None:
+try:
+    import fcntl
+except ImportError:  # windows: appends are not safe to run concurrently there
+    fcntl = None
+
+# Deck folder layout (format version 1):
+#   <name>_<k>.pdk   chunk files: a fixed header followed by one bit-packed row per deck
+#   index.bin        append-only list of (chunk number, first deck, deck count) records
+#   metadata.json    summary for humans and for the TUI's folder list, rewritten on every save
+# Folders written before the format existed hold headerless <name>_<k>.bin files and are
+# converted to a single chunk the first time new decks are saved into them.
+
+CHUNK_MAGIC = b"PENNEYDK"
+CHUNK_VERSION = 1
+# magic, version, deck size, red cards per deck (-1 if mixed), flags, deck count, seed, crc32 of the
+# packed rows, reserved. The seed is a placeholder: deck_gen draws from an unseeded generator, so
+# chunks are written with -1 (unknown) until generation takes a seed that can be passed to save_decks.
+_HEADER = struct.Struct("<8sHHhHQqII")
+_INDEX_RECORD = struct.Struct("<IIQQ")  # chunk number, reserved, first deck, deck count
+_INDEX_FILE = "index.bin"
+_LOCK_FILE = ".lock"
+_UNPACK_ROWS = 1 << 12  # rows unpacked per step when a chunk can't be unpacked in place (~200KB at 52 cards)
+# row b of the table is byte b as eight 0/1 cards, so taking rows by packed byte unpacks them
+_BYTE_BITS = np.unpackbits(np.arange(256, dtype=np.uint8)[:, None], axis=1)
+
+
+class DeckFileError(ValueError):
+    """A chunk or index file is truncated, corrupted or of an unknown format"""
+
+
+def _row_bytes(deck_size: int) -> int:
+    return (deck_size + 7) // 8
+
+
+def _chunk_path(foldername: str, k: int) -> str:
+    return f"{foldername}/{os.path.basename(os.path.normpath(foldername))}_{k}.pdk"
+
+
+@contextmanager
+def _folder_lock(foldername: str):
+    """Serialize writers of one deck folder (across processes where fcntl is available)"""
+    with open(f"{foldername}/{_LOCK_FILE}", "a") as lock:
+        if fcntl is not None:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(lock, fcntl.LOCK_UN)
+
+
+def _encode_chunk(cards: np.ndarray, seed: int = -1) -> bytes:
+    rows = np.packbits(cards, axis=1).tobytes() if len(cards) else b""
+    ones = cards.sum(axis=1) if len(cards) else np.empty(0)
+    composition = int(ones[0]) if len(ones) and (ones == ones[0]).all() else -1
+    header = _HEADER.pack(
+        CHUNK_MAGIC, CHUNK_VERSION, cards.shape[1], composition, 0, len(cards), seed, zlib.crc32(rows), 0
+    )
+    return header + rows
+
+
+def read_chunk_header(path: str) -> dict:
+    """Header fields of one chunk file"""
+    with open(path, "rb") as f:
+        raw = f.read(_HEADER.size)
+    if len(raw) != _HEADER.size:
+        raise DeckFileError(f"{path}: truncated header")
+    magic, version, deck_size, composition, _, count, seed, crc, _ = _HEADER.unpack(raw)
+    if magic != CHUNK_MAGIC:
+        raise DeckFileError(f"{path}: not a deck chunk")
+    if version > CHUNK_VERSION:
+        raise DeckFileError(f"{path}: chunk format version {version} is newer than this reader")
+    return {
+        "version": version,
+        "deck_size": deck_size,
+        "composition": composition,
+        "count": count,
+        "seed": seed,
+        "crc32": crc,
+    }
+
+
+def _chunk_rows(data: bytes, path: str = "<chunk>", verify: bool = True) -> tuple[np.ndarray, int]:
+    """The packed (decks, row bytes) rows of a chunk and its deck size, after checking the header"""
+    if len(data) < _HEADER.size:
+        raise DeckFileError(f"{path}: truncated header")
+    magic, version, deck_size, _, _, count, _, crc, _ = _HEADER.unpack_from(data)
+    if magic != CHUNK_MAGIC or version > CHUNK_VERSION:
+        raise DeckFileError(f"{path}: not a readable deck chunk")
+    rows = memoryview(data)[_HEADER.size :]
+    if len(rows) != count * _row_bytes(deck_size):
+        raise DeckFileError(f"{path}: expected {count} decks, file holds {len(rows)} bytes of rows")
+    if verify and zlib.crc32(rows) != crc:
+        raise DeckFileError(f"{path}: checksum mismatch")
+    return np.frombuffer(rows, dtype=np.uint8).reshape(count, _row_bytes(deck_size)), deck_size
+
+
+def _unpack_into(packed: np.ndarray, out: np.ndarray) -> None:
+    """Unpack (decks, row bytes) rows into the contiguous (decks, deck_size) card array `out`"""
+    if out.shape[1] % 8 == 0:
+        # whole bytes per row: look every byte's eight cards up straight into `out`
+        # (clip never triggers on uint8 indices, and unlike raise it lets take write without a buffer)
+        np.take(_BYTE_BITS, packed, axis=0, out=out.reshape(len(out), -1, 8), mode="clip")
+        return
+    # np.unpackbits has no out argument, so keep its temporary to a cache-sized block of rows
+    for i in range(0, len(out), _UNPACK_ROWS):
+        out[i : i + _UNPACK_ROWS] = np.unpackbits(packed[i : i + _UNPACK_ROWS], axis=1, count=out.shape[1])
+
+
+def read_index(foldername: str) -> np.ndarray:
+    """Index records as an (chunks, 3) int64 array of [chunk number, first deck, deck count]"""
+    path = f"{foldername}/{_INDEX_FILE}"
+    if not os.path.exists(path):
+        return np.empty((0, 3), dtype=np.int64)
+    with open(path, "rb") as f:
+        raw = f.read()
+    # a record cut short by a crash mid-append is ignored, the chunk it points at is unreachable
+    whole = len(raw) // _INDEX_RECORD.size
+    records = [_INDEX_RECORD.unpack_from(raw, i * _INDEX_RECORD.size) for i in range(whole)]
+    return np.array([[k, start, count] for k, _, start, count in records], dtype=np.int64).reshape(-1, 3)
+
+
+def _locate_deck(foldername: str, i: int) -> tuple[int, int] | None:
+    """
+    (chunk number, row within the chunk) of deck `i` (negative counts from the end), found by binary
+    search over index.bin so only O(log chunks) records are read. None for a folder without an index.
+    """
+    path = f"{foldername}/{_INDEX_FILE}"
+    if not os.path.exists(path):
+        return None
+    size = _INDEX_RECORD.size
+    with open(path, "rb") as f:
+        whole = os.fstat(f.fileno()).st_size // size
+        if whole == 0:
+            return None
+
+        def _record(r: int) -> tuple[int, int, int]:
+            f.seek(r * size)
+            k, _, start, count = _INDEX_RECORD.unpack(f.read(size))
+            return k, start, count
+
+        first, last = _record(0), _record(whole - 1)
+        base, end = first[1], last[1] + last[2]
+        if i < 0:
+            i += end - base
+        i += base
+        if not base <= i < end:
+            raise IndexError("deck index out of range")
+        lo, hi = 0, whole - 1  # last record whose first deck is <= i
+        while lo < hi:
+            mid = (lo + hi + 1) // 2
+            if _record(mid)[1] <= i:
+                lo = mid
+            else:
+                hi = mid - 1
+        k, start, _ = _record(lo)
+        return k, i - start
+
+
+def _legacy_files(foldername: str) -> list[str]:
+    """Headerless .bin chunk files, ordered by their numeric suffix"""
+    def _number(name: str) -> int:
+        match = re.search(r"_(\d+)\.bin$", name)
+        return int(match.group(1)) if match else -1
+
+    return sorted((f for f in os.listdir(foldername) if f.endswith(".bin") and f != _INDEX_FILE), key=_number)
+
+
+def _load_legacy(foldername: str, deck_size: int, workers: int | None = None) -> np.ndarray:
+    files = _legacy_files(foldername)
+    # every legacy file starts on a deck boundary, so its share of the output is known from its size
+    counts = [os.path.getsize(f"{foldername}/{file}") * 8 // deck_size for file in files]
+    starts = np.concatenate(([0], np.cumsum(counts, dtype=np.int64)))
+    cards = np.empty((int(starts[-1]), deck_size), dtype=np.uint8)
+
+    def _load(i: int) -> None:
+        with open(f"{foldername}/{files[i]}", "rb") as f:
+            packed = np.frombuffer(f.read(), dtype=np.uint8).copy()
+        # the old writer packed a file's last partial byte with int(bits, 2), i.e. right-aligned
+        tail = counts[i] * deck_size % 8
+        if tail and len(packed):
+            packed[-1] <<= 8 - tail
+        bits = np.unpackbits(packed, count=counts[i] * deck_size)
+        cards[starts[i] : starts[i + 1]] = bits.reshape(counts[i], deck_size)
+
+    thread_map(_load, list(range(len(files))), workers, "penney-io")
+    return cards
+
+
+def _read_metadata(foldername: str) -> dict:
+    try:
+        with open(f"{foldername}/metadata.json", "r") as mdj:
+            return json.loads(mdj.read())
+    except (OSError, ValueError):
+        return {}
+
+
+def _append_chunks(foldername: str, chunks: list[tuple[bytes, int]], workers: int | None = None) -> None:
+    """
+    Write encoded (chunk bytes, deck count) chunks and register them in the index in order;
+    caller holds the folder lock
+    """
+    index = read_index(foldername)
+    first_k = int(index[:, 0].max()) + 1 if len(index) else 1
+    start = int(index[-1, 1] + index[-1, 2]) if len(index) else 0
+
+    def _write(i: int) -> None:
+        # write under a temporary name so a crash never leaves a half-written chunk under a real name
+        tmp = f"{foldername}/.{uuid.uuid4().hex}.tmp"
+        with open(tmp, "wb") as f:
+            f.write(chunks[i][0])
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, _chunk_path(foldername, first_k + i))
+
+    thread_map(_write, list(range(len(chunks))), workers, "penney-io")
+    records = bytearray()
+    for i, (_, count) in enumerate(chunks):
+        records += _INDEX_RECORD.pack(first_k + i, 0, start, count)
+        start += count
+    # chunks only become visible once their records land, in one append
+    with open(f"{foldername}/{_INDEX_FILE}", "ab") as f:
+        f.write(records)
+        f.flush()
+        os.fsync(f.fileno())
+
+
+def _migrate_legacy(foldername: str, deck_size: int) -> None:
+    """Convert headerless .bin files into one indexed chunk; caller holds the folder lock"""
+    legacy = _legacy_files(foldername)
+    if not legacy or len(read_index(foldername)):
+        return
+    cards = _load_legacy(foldername, deck_size)
+    _append_chunks(foldername, [(_encode_chunk(cards), len(cards))])
+    for file in legacy:
+        os.remove(f"{foldername}/{file}")
+
+
+def save_decks(
+    deck: Deck,
+    filename: str,
+    file_size: int = 80000000,
+    overwrite: bool = False,
+    seed: int = -1,
+    workers: int | None = None,
+) -> None:
     """Save decks as directory of files with `file_size` number of cards. Maximum size of 10MB"""
-    deck_list = deck._decks
+    cards = deck.array
     deck_size = deck.deck_size
-    if file_size < 1: 
-        chunk_size = len(deck_list) * deck_size
+    if file_size < 1:
+        chunk_size = len(cards) * deck_size
     else:
         chunk_size = file_size
     if chunk_size * deck_size >= 80000000:
         print("Warning: file size greater than 10MB, automatically setting to 10MB")
-        chunk_size = 80000000 // deck_size 
-    
-    fileSplit = [a.tolist() for a in np.array_split(deck_list, len(deck_list) // chunk_size + 1)]
+        chunk_size = 80000000 // deck_size
+
+    fileSplit = [split for split in np.array_split(cards, len(cards) // chunk_size + 1) if len(split)]
+    # encoding (packing + checksums) doesn't touch the folder, so it runs before taking the lock
+    encoded = thread_map(lambda split: (_encode_chunk(split, seed), len(split)), fileSplit, workers, "penney-io")
     file_path = f"data/{filename}"
     os.makedirs(file_path, exist_ok=True)
-    offset = max(1, len(os.listdir(file_path)))
-    for d in range(len(fileSplit)):
-        with open(f"{file_path}/{filename}_{d+offset}.bin", "bw") as f:
-            f.write(compress(fileSplit[d]))
-    with open(f"{file_path}/metadata.json", "w") as md:
-        json.dump(
-            {
-                "deck_size": deck_size,
-                "chunk_size": chunk_size,
-                "total_decks": len(deck_list),
-                "total_deck_files": len(os.listdir(file_path)),
-            },
-            md,
-        )
+    with _folder_lock(file_path):
+        md = _read_metadata(file_path)
+        # legacy folders count too: their decks are migrated under the size they were saved with
+        if _legacy_files(file_path) or len(read_index(file_path)):
+            if md.get("deck_size", 52) != deck_size:  # 52 is what load_decks assumes without metadata
+                raise ValueError("Deck sizes do not match")
+        _migrate_legacy(file_path, deck_size)
+        _append_chunks(file_path, encoded, workers)
+        index = read_index(file_path)
+        tmp = f"{file_path}/.metadata.json.tmp"
+        with open(tmp, "w") as md_file:
+            json.dump(
+                {
+                    "format_version": CHUNK_VERSION,
+                    "deck_size": deck_size,
+                    "chunk_size": chunk_size,
+                    "total_decks": int(index[:, 2].sum()),
+                    "total_deck_files": len(index),
+                },
+                md_file,
+            )
+        os.replace(tmp, f"{file_path}/metadata.json")
 
 
 def compress(deckList: list[str]) -> bytearray:
     """
     Convert deck to binary file represented as hexadecimal
-    
-    Each card is represented as one bit, and each byte stores 8 cards. 
+
+    Each card is represented as one bit, and each byte stores 8 cards.
     """
     s = "".join(deckList)
     i = 0
@@ -50,18 +311,73 @@ def compress(deckList: list[str]) -> bytearray:
     return buffer
 
 
-def load_decks(foldername: str = "data/decktest_decks") -> Deck:
-    """Decompress decks from directory of binary files."""
-    deckList = []
-    with open(f"{foldername}/metadata.json", "r") as mdj:  ## pull deck_size from metadata
+def load_decks(foldername: str = "data/decktest_decks", verify: bool = True, workers: int | None = None) -> Deck:
+    """
+    Decompress decks from directory of binary files, in the order they were saved.
+
+    Chunks are read, verified and unpacked on a thread pool straight into their slice of one
+    preallocated array.
+    """
+    md = _read_metadata(foldername)
+    deck_size = md.get("deck_size", 52)  ## pull deck_size from metadata
+
+    index = read_index(foldername)
+    if not len(index):
+        return Deck(_load_legacy(foldername, deck_size, workers))
+
+    base = int(index[0, 1])
+    cards = np.empty((int(index[:, 2].sum()), deck_size), dtype=np.uint8)
+
+    def _load(record: list[int]) -> None:
+        k, start, count = record
+        path = _chunk_path(foldername, k)
+        with open(path, "rb") as f:
+            packed, chunk_size = _chunk_rows(f.read(), path, verify)
+        if (len(packed), chunk_size) != (count, deck_size):
+            raise DeckFileError(f"{path}: holds {(len(packed), chunk_size)} decks, index expects {(count, deck_size)}")
+        _unpack_into(packed, cards[start - base : start - base + count])
+
+    thread_map(_load, index.tolist(), workers, "penney-io")
+    return Deck(cards)
+
+
+def read_deck(foldername: str, i: int) -> str:
+    """Read deck `i` of a saved folder without loading the rest"""
+    location = _locate_deck(foldername, i)
+    if location is None:
+        return load_decks(foldername)[i]
+    k, row = location
+    path = _chunk_path(foldername, k)
+    header = read_chunk_header(path)
+    width = _row_bytes(header["deck_size"])
+    with open(path, "rb") as f:
+        f.seek(_HEADER.size + row * width)
+        packed = np.frombuffer(f.read(width), dtype=np.uint8)
+    cards = np.unpackbits(packed, count=header["deck_size"])
+    return (cards + ord("0")).tobytes().decode("ascii")
+
+
+def verify_decks(foldername: str, workers: int | None = None) -> list[str]:
+    """Check every indexed chunk's header, size and checksum; returns a list of problems (empty when clean)"""
+    problems = []
+    index = read_index(foldername)
+    expected_start = int(index[0, 1]) if len(index) else 0
+    for k, start, count in index.tolist():
+        if start != expected_start:
+            problems.append(f"{_chunk_path(foldername, k)}: index starts at deck {start}, expected {expected_start}")
+        expected_start = start + count
+
+    def _check(record: list[int]) -> str | None:
+        k, _, count = record
+        path = _chunk_path(foldername, k)
         try:
-            md = json.loads(mdj.read())
-            deck_size = md["deck_size"]
-        except KeyError:
-            deck_size = 52
-
-    for file in [file for file in os.listdir(foldername) if file.endswith(".bin")]:
-        with open(f"{foldername}/{file}", "rb") as f:
-            d = "".join(format(w, "08b") for w in f.read())
-        deckList += ["".join(item) for item in zip(*[iter(d)] * (deck_size))]
-    return Deck(deckList)
+            with open(path, "rb") as f:
+                packed, _ = _chunk_rows(f.read(), path, verify=True)
+        except (OSError, DeckFileError) as e:
+            return str(e)
+        if len(packed) != count:
+            return f"{path}: holds {len(packed)} decks, index expects {count}"
+        return None
+
+    problems += [p for p in thread_map(_check, index.tolist(), workers, "penney-io") if p is not None]
+    return problems
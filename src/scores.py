@@ -13,18 +13,31 @@ def _resolve_score_path(filename: str | Path) -> Path:
     return path
 
 
+_COUNT_COLUMNS = ["win", "loss", "tie"]
+_VARIANCE_COLUMNS = ["win_var", "loss_var", "tie_var"]
+
+
 def load_table(filename: str | Path, scoring_by_tricks: bool = True) -> ScoreTable:
     """Load scores from a .csv file."""
     path = _resolve_score_path(filename)
-    w = pd.read_csv(path, dtype={"p1choice": str, "p2choice": str}).values.tolist()
-    return ScoreTable(w, scoring_by_tricks)
+    df = pd.read_csv(path, dtype={"p1choice": str, "p2choice": str}, float_precision="round_trip")
+    w = df[["p1choice", "p2choice", *_COUNT_COLUMNS]].values.tolist()
+    variance = df[_VARIANCE_COLUMNS].to_numpy() if set(_VARIANCE_COLUMNS) <= set(df.columns) else None
+    return ScoreTable(w, scoring_by_tricks, variance=variance)
 
 
 class ScoreTable:
-    def __init__(self, data, scoring_by_tricks: bool = True):
-        """Takes a list returned by `Parser.rawOut()`"""
+    def __init__(self, data, scoring_by_tricks: bool = True, variance=None):
+        """
+        Takes a list returned by `Parser.rawOut()`
+
+        `variance` - optional (pairs, 3) variance of the win/loss/tie chances, for decks that were not
+        plain shuffles (see `src.variance.score_with_variance`). Without it the multinomial variance is used
+        """
         self.scoring = scoring_by_tricks
-        self.raw = pd.DataFrame(data, columns=["p1choice", "p2choice", "win", "loss", "tie"])
+        self.raw = pd.DataFrame(data, columns=["p1choice", "p2choice", *_COUNT_COLUMNS])
+        if variance is not None:
+            self.raw[_VARIANCE_COLUMNS] = np.asarray(variance, dtype=np.float64).reshape(len(self.raw), 3)
         self.table = self._create_table()
 
     def _create_table(self) -> pd.DataFrame:
@@ -40,10 +53,29 @@ class ScoreTable:
        
     def addData(self, other: ScoreTable) -> None:
         """Add data from other scoretable object"""
+        if _VARIANCE_COLUMNS[0] in self.raw or _VARIANCE_COLUMNS[0] in other.raw:
+            # independent deck sets: weight each variance by its share of decks squared
+            n1 = self.raw[_COUNT_COLUMNS].sum(axis=1).to_numpy(dtype=np.float64)[:, None]
+            n2 = other.raw[_COUNT_COLUMNS].sum(axis=1).to_numpy(dtype=np.float64)[:, None]
+            combined = (n1**2 * self.variance() + n2**2 * other.variance()) / np.maximum(n1 + n2, 1) ** 2
+            self.raw[_VARIANCE_COLUMNS] = combined
         self.raw[['win','loss','tie']] += other.raw[['win','loss','tie']]
         self.table = self._create_table()
         return
 
+    def variance(self) -> np.ndarray:
+        """(pairs, 3) variance of the win/loss/tie chances, in `raw` row order"""
+        if _VARIANCE_COLUMNS[0] in self.raw:
+            return self.raw[_VARIANCE_COLUMNS].to_numpy(dtype=np.float64)
+        counts = self.raw[_COUNT_COLUMNS].to_numpy(dtype=np.float64)
+        n = np.maximum(counts.sum(axis=1, keepdims=True), 1)
+        p = counts / n
+        return p * (1 - p) / n
+
+    def std_error(self) -> np.ndarray:
+        """(pairs, 3) standard error of the win/loss/tie chances, e.g. `std_error()[:, 0]` for heatmap error bars"""
+        return np.sqrt(self.variance())
+
     def save(self, filename: str) -> None:
         """Save score table as csv file."""
         path = _resolve_score_path(filename)
@@ -0,0 +1,223 @@
+from __future__ import annotations
+import re
+import json
+import time
+import argparse
+import threading
+from itertools import permutations
+from pathlib import Path
+from urllib.parse import urlparse, parse_qs
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import numpy as np
+from src.scores import load_table
+
+# Local read-only query service over the score caches that main.py writes to data/<folder>/.
+#
+#   python -m src.service --data data --port 8765
+#
+#   GET  /tables                               -> cached tables and their deck counts
+#   GET  /lookup?p1=011&p2=100&bits=3&scoring=cards[&folder=...]
+#   POST /lookup  {"queries": [{"p1": "011", "p2": "100", "bits": 3, "scoring": "tricks"}, ...]}
+#   GET  /best?p1=011&bits=3&scoring=cards[&folder=...]   -> p2 choice with the best win chance
+#
+# Tables are memory-mapped .npy counts and are reloaded whenever their meta file changes.
+
+_CACHE_FILE = re.compile(r"scores_bits(\d+)_(tricks|cards)\.meta\.json$")
+_RELOAD_SECONDS = 0.5  # how often request threads may stat the data directory
+
+
+def _pair_list(bits: int) -> list[tuple[str, str]]:
+    # same order as Parser.pairs, which is the row order of every score cache
+    player_options = [str(bin(w))[2:].zfill(bits) for w in range(2**bits)]
+    return list(permutations(player_options, 2))
+
+
+class ScoreIndex:
+    """In-memory index of every cached score table under a data directory"""
+
+    def __init__(self, data_dir: str | Path = "data") -> None:
+        self.data_dir = Path(data_dir)
+        self._lock = threading.Lock()
+        self._tables: dict[tuple[str, int, str], dict] = {}
+        self._pair_index: dict[int, dict[tuple[str, str], int]] = {}
+        self._last_scan = 0.0
+        self.reload(force=True)
+
+    def _load_counts(self, folder: Path, bits: int, method: str) -> np.ndarray | None:
+        npy_path = folder / f"scores_bits{bits}_{method}.npy"
+        if npy_path.exists():
+            return np.load(npy_path, mmap_mode="r")
+        # caches written before the .npy copy existed only have the csv
+        csv_path = folder / f"scores_bits{bits}_{method}.csv"
+        if csv_path.exists():
+            return load_table(csv_path).raw[["win", "loss", "tie"]].to_numpy(dtype=np.int64)
+        return None
+
+    def reload(self, force: bool = False) -> None:
+        """Pick up new or rewritten score caches (cheap when nothing changed)"""
+        now = time.monotonic()
+        if not force and now - self._last_scan < _RELOAD_SECONDS:
+            return
+        with self._lock:
+            self._last_scan = now
+            tables = {}
+            for meta_path in self.data_dir.glob("*/scores_bits*_*.meta.json"):
+                match = _CACHE_FILE.match(meta_path.name)
+                if match is None:
+                    continue
+                bits, method = int(match.group(1)), match.group(2)
+                key = (meta_path.parent.name, bits, method)
+                mtime = meta_path.stat().st_mtime
+                current = self._tables.get(key)
+                if current is not None and current["mtime"] == mtime:
+                    tables[key] = current
+                    continue
+                try:
+                    meta = json.loads(meta_path.read_text())
+                    counts = self._load_counts(meta_path.parent, bits, method)
+                except Exception:
+                    continue
+                if counts is None or counts.shape != (len(_pair_list(bits)), 3):
+                    continue
+                tables[key] = {"counts": counts, "deck_count": int(meta.get("deck_count", 0)), "mtime": mtime}
+            self._tables = tables
+
+    def _pairs(self, bits: int) -> dict[tuple[str, str], int]:
+        if bits not in self._pair_index:
+            self._pair_index[bits] = {pair: idx for idx, pair in enumerate(_pair_list(bits))}
+        return self._pair_index[bits]
+
+    def table(self, bits: int, scoring: str, folder: str | None = None) -> dict:
+        """Counts for one (bits, scoring); without `folder`, the table built from the most decks"""
+        self.reload()
+        tables = self._tables
+        if folder is not None:
+            try:
+                return tables[(folder, bits, scoring)]
+            except KeyError:
+                raise KeyError(f"No {scoring} scores for {bits} bits in {folder}") from None
+        candidates = [t for (_, b, m), t in tables.items() if b == bits and m == scoring]
+        if not candidates:
+            raise KeyError(f"No {scoring} scores cached for {bits} bits")
+        return max(candidates, key=lambda t: t["deck_count"])
+
+    def tables(self) -> list[dict]:
+        self.reload()
+        return [
+            {"folder": folder, "bits": bits, "scoring": method, "deck_count": t["deck_count"]}
+            for (folder, bits, method), t in sorted(self._tables.items())
+        ]
+
+    def lookup(self, p1: str, p2: str, bits: int, scoring: str = "tricks", folder: str | None = None) -> dict:
+        """P(win), P(loss) and P(tie) for p1 against p2"""
+        table = self.table(bits, scoring, folder)
+        try:
+            w, l, t = (int(x) for x in table["counts"][self._pairs(bits)[(p1, p2)]])
+        except KeyError:
+            raise KeyError(f"No pair ({p1}, {p2}) for {bits} bits") from None
+        n = max(w + l + t, 1)
+        return {"p1": p1, "p2": p2, "win": w / n, "loss": l / n, "tie": t / n, "n": w + l + t}
+
+    def lookup_many(self, queries: list[dict]) -> list[dict]:
+        if not isinstance(queries, list):
+            raise ValueError("queries must be a list of objects")
+        results = []
+        for q in queries:
+            if not isinstance(q, dict):
+                results.append({"error": "query must be an object with p1, p2 and bits"})
+                continue
+            try:
+                results.append(
+                    self.lookup(str(q["p1"]), str(q["p2"]), int(q["bits"]), q.get("scoring", "tricks"), q.get("folder"))
+                )
+            except (KeyError, ValueError, TypeError) as e:
+                results.append({"error": str(e)})
+        return results
+
+    def best_response(self, p1: str, bits: int, scoring: str = "tricks", folder: str | None = None) -> dict:
+        """p2 choice that wins most often against `p1`"""
+        table = self.table(bits, scoring, folder)
+        counts = np.asarray(table["counts"])
+        best = None
+        for (a, b), idx in self._pairs(bits).items():
+            if a != p1:
+                continue
+            n = max(int(counts[idx].sum()), 1)
+            p2_win = int(counts[idx, 1]) / n
+            if best is None or p2_win > best["win"]:
+                best = {"p1": p1, "p2": b, "win": p2_win, "tie": int(counts[idx, 2]) / n, "n": int(counts[idx].sum())}
+        if best is None:
+            raise KeyError(f"No choice {p1} for {bits} bits")
+        return best
+
+
+def _make_handler(index: ScoreIndex):
+    class Handler(BaseHTTPRequestHandler):
+        def _reply(self, status: int, body) -> None:
+            data = json.dumps(body).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def do_GET(self) -> None:
+            url = urlparse(self.path)
+            q = {k: v[0] for k, v in parse_qs(url.query).items()}
+            try:
+                if url.path == "/tables":
+                    self._reply(200, index.tables())
+                elif url.path == "/lookup":
+                    scoring, folder = q.get("scoring", "tricks"), q.get("folder")
+                    self._reply(200, index.lookup(q["p1"], q["p2"], int(q["bits"]), scoring, folder))
+                elif url.path == "/best":
+                    scoring, folder = q.get("scoring", "tricks"), q.get("folder")
+                    self._reply(200, index.best_response(q["p1"], int(q["bits"]), scoring, folder))
+                else:
+                    self._reply(404, {"error": f"unknown path {url.path}"})
+            except (KeyError, ValueError) as e:
+                self._reply(400, {"error": str(e)})
+
+        def do_POST(self) -> None:
+            url = urlparse(self.path)
+            if url.path != "/lookup":
+                self._reply(404, {"error": f"unknown path {url.path}"})
+                return
+            try:
+                body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+                if not isinstance(body, dict):
+                    raise ValueError("request body must be an object with a queries list")
+                self._reply(200, index.lookup_many(body["queries"]))
+            except (KeyError, ValueError, TypeError, AttributeError) as e:
+                self._reply(400, {"error": str(e)})
+
+        def log_message(self, format, *args) -> None:
+            # keep request logging out of the way of lookups
+            return
+
+    return Handler
+
+
+def make_server(data_dir: str | Path = "data", host: str = "127.0.0.1", port: int = 8765) -> ThreadingHTTPServer:
+    """Build the HTTP server (port 0 picks a free port); call `serve_forever()` to run it"""
+    return ThreadingHTTPServer((host, port), _make_handler(ScoreIndex(data_dir)))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Serve cached Penney's game scores over localhost HTTP")
+    parser.add_argument("--data", default="data", help="directory holding the deck folders")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    args = parser.parse_args()
+    server = make_server(args.data, args.host, args.port)
+    print(f"Serving scores from {args.data} on http://{args.host}:{server.server_address[1]}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
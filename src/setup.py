@@ -23,7 +23,7 @@ if is_x86 and not (sys.platform == "darwin"):
 extensions = [
     Extension(
         name="parser",
-        sources=["parser.pyx"],
+        sources=["parser.py"],
         include_dirs=[np.get_include()],
         extra_compile_args=common_compile_args,
     ),
@@ -57,7 +57,13 @@ setup(
     description="a",
     ext_modules=cythonize(
         extensions,
-        compiler_directives={"language_level": 3, "infer_types": True, "emit_code_comments": False},
+        compiler_directives={
+            "language_level": 3,
+            "infer_types": True,
+            "emit_code_comments": False,
+            # kernels hold no mutable module state once imported, so they are safe without the GIL
+            "freethreading_compatible": True,
+        },
         annotate=True,
         force=True,
     ),
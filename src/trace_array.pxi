@@ -0,0 +1,41 @@
+# Shared by fastmatch and fastmatch_simd (include after score_one3/score_one4 and _card_pattern).
+
+
+def trace_array(const uint8_t[:, ::1] cards, str p1, str p2, TraceEvent[::1] events,
+                bint aligned=False, Py_ssize_t start=0, Py_ssize_t stop=-1, int64_t deck_offset=0):
+    """
+    play rows [start, stop) of a (decks, deck_size) array of 0/1 cards with this module's
+    score_one3/score_one4 and record every trick into `events`, a preallocated
+    `npmatch.TRACE_DTYPE` array, from events[0]. only whole decks are written: tracing stops early
+    when the next deck might not fit.
+
+    returns (next deck to trace, events written). decks are numbered from `deck_offset`.
+    """
+    cdef Py_ssize_t w = len(p1)
+    cdef uint32_t p1t = _card_pattern(p1)
+    cdef uint32_t p2t = _card_pattern(p2)
+    cdef Py_ssize_t n = cards.shape[1]
+    cdef Py_ssize_t cap = events.shape[0]
+    cdef Py_ssize_t most = n // w  # every trick takes at least w cards
+    cdef Py_ssize_t k, at = 0
+    cdef long p1cards, p2cards, drawcards
+    cdef long p1tricks, p2tricks
+
+    if stop < 0 or stop > cards.shape[0]:
+        stop = cards.shape[0]
+    if start < 0:
+        start = 0
+    if cap < most or cap == 0:
+        raise ValueError("event buffer is smaller than the most tricks one deck can have")
+
+    k = start
+    with nogil:
+        while k < stop and cap - at >= most:
+            if w == 3:
+                at = score_one3(&cards[k, 0], n, p1t, p2t, aligned, &p1cards, &p2cards, &drawcards,
+                                &p1tricks, &p2tricks, &events[0], deck_offset + k, at)
+            else:
+                at = score_one4(&cards[k, 0], n, p1t, p2t, aligned, &p1cards, &p2cards, &drawcards,
+                                &p1tricks, &p2tricks, &events[0], deck_offset + k, at)
+            k += 1
+    return k, at
@@ -0,0 +1,35 @@
+# Shared by fastmatch and fastmatch_simd (include before score_one3/score_one4).
+#
+# score_one3/score_one4 take a `Recorder*`. Counting callers pass <NoTrace*>NULL and get a
+# specialization with no tracing code in it; `trace_array` passes a TraceEvent buffer and gets a
+# second specialization of the very same trick loop and pattern search that also records each trick.
+
+from libc.stdint cimport int8_t, int64_t, uint16_t
+
+
+cdef packed struct TraceEvent:
+    # layout of npmatch.TRACE_DTYPE
+    int64_t deck
+    uint16_t trick
+    uint16_t position
+    int8_t winner
+    uint16_t cards
+
+
+cdef struct NoTrace:
+    char unused
+
+
+ctypedef fused Recorder:
+    NoTrace
+    TraceEvent
+
+
+cdef inline Py_ssize_t record_trick(TraceEvent* events, Py_ssize_t at, int64_t deck, long trick,
+                                    Py_ssize_t position, bint by_p1, Py_ssize_t cards) noexcept nogil:
+    events[at].deck = deck
+    events[at].trick = <uint16_t>trick
+    events[at].position = <uint16_t>position
+    events[at].winner = 1 if by_p1 else -1
+    events[at].cards = <uint16_t>cards
+    return at + 1
@@ -0,0 +1,188 @@
+from __future__ import annotations
+import os
+import json
+import numpy as np
+from src import npmatch
+from src.decks import Deck
+from src.npmatch import TRACE_DTYPE
+
+try:
+    from src import fastmatch_simd
+except Exception:
+    fastmatch_simd = None
+try:
+    from src import fastmatch
+except Exception:
+    fastmatch = None
+
+# Opt-in trick-level tracing for debugging kernel disagreements and studying game length.
+#
+#   events = trace_events(deck.array, "011", "100")                        # in memory
+#   events = trace_events(deck.array, "011", "100", kernel="fastmatch")    # a specific kernel
+#   trace_to_folder(deck.array, "011", "100", "data/trace")                 # flushed in chunks
+#   events = load_trace("data/trace")
+#   first_disagreement(deck.array, "011", "100")                           # kernels vs reference
+#
+# Each event is one trick: (deck, trick, position, winner, cards), see `npmatch.TRACE_DTYPE`.
+# fastmatch and fastmatch_simd trace with a second compiled specialization of their own
+# score_one3/score_one4 (see trace_hook.pxi), so a trace follows the exact pattern search the
+# counting kernels use, while their counting specialization has no tracing code in it.
+
+_CHUNK_EVENTS = 1 << 20  # events held in memory before a chunk is written (~17MB)
+
+
+def kernels() -> dict:
+    """Available tracing kernels by module name, fastest first"""
+    found = {mod.__name__.rsplit(".", 1)[-1]: mod for mod in (fastmatch_simd, fastmatch) if mod is not None}
+    found["npmatch"] = npmatch
+    return found
+
+
+def _trace_array(kernel: str | None):
+    available = kernels()
+    if kernel is None:
+        return next(iter(available.values())).trace_array
+    try:
+        return available[kernel].trace_array
+    except KeyError:
+        raise ValueError(f"Kernel {kernel!r} is not available, expected one of {list(available)}") from None
+
+
+def _cards(cards) -> np.ndarray:
+    return np.ascontiguousarray(getattr(cards, "array", cards), dtype=np.uint8)
+
+
+def trace_events(
+    cards, p1: str, p2: str, aligned: bool = False, kernel: str | None = None, deck_offset: int = 0
+) -> np.ndarray:
+    """
+    All tricks of every deck in a Deck or (decks, deck_size) card array, in one record array.
+    `kernel` is one of `kernels()` (default: the fastest available)
+    """
+    cards = _cards(cards)
+    events = np.empty(max(1, len(cards) * (cards.shape[1] // len(p1))), dtype=TRACE_DTYPE)
+    _, count = _trace_array(kernel)(cards, p1, p2, events, aligned, 0, -1, deck_offset)
+    return events[:count]
+
+
+class TraceWriter:
+    """
+    Traces decks into a folder of `events_<k>.npy` chunks of at most `chunk_events` events.
+
+    The event buffer is allocated once and written out whenever it fills, so memory stays bounded
+    however many decks are traced. Use as a context manager, or call `close()` to write the rest.
+    """
+
+    def __init__(
+        self,
+        folder: str,
+        p1: str,
+        p2: str,
+        aligned: bool = False,
+        chunk_events: int = _CHUNK_EVENTS,
+        kernel: str | None = None,
+    ):
+        self.folder = folder
+        self.p1, self.p2, self.aligned = p1, p2, aligned
+        self._trace_array = _trace_array(kernel)
+        self._events = np.empty(chunk_events, dtype=TRACE_DTYPE)
+        self._count = 0
+        self._chunks = 0
+        self._decks = 0
+        os.makedirs(folder, exist_ok=True)
+
+    def trace(self, cards) -> None:
+        """Trace the next batch of decks; they are numbered after every deck traced so far"""
+        cards = _cards(cards)
+        start = 0
+        while start < len(cards):
+            if len(self._events) - self._count < cards.shape[1] // len(self.p1):
+                self.flush()
+            start, written = self._trace_array(
+                cards, self.p1, self.p2, self._events[self._count :], self.aligned, start, -1, self._decks
+            )
+            self._count += written
+        self._decks += len(cards)
+
+    def flush(self) -> None:
+        """Write buffered events as the next chunk"""
+        if self._count == 0:
+            return
+        np.save(f"{self.folder}/events_{self._chunks}.npy", self._events[: self._count])
+        self._chunks += 1
+        self._count = 0
+
+    def close(self) -> None:
+        self.flush()
+        with open(f"{self.folder}/metadata.json", "w") as md_file:
+            json.dump(
+                {"p1": self.p1, "p2": self.p2, "aligned": self.aligned, "decks": self._decks, "chunks": self._chunks},
+                md_file,
+            )
+
+    def __enter__(self) -> TraceWriter:
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+
+def trace_to_folder(
+    cards,
+    p1: str,
+    p2: str,
+    folder: str,
+    aligned: bool = False,
+    chunk_events: int = _CHUNK_EVENTS,
+    kernel: str | None = None,
+) -> None:
+    """Trace every deck into `folder`, see `TraceWriter`"""
+    with TraceWriter(folder, p1, p2, aligned, chunk_events, kernel) as writer:
+        writer.trace(cards)
+
+
+def load_trace(folder: str, mmap: bool = False) -> np.ndarray:
+    """All events in a trace folder, in deck then trick order"""
+    with open(f"{folder}/metadata.json", "r") as mdj:
+        chunks = json.load(mdj)["chunks"]
+    parts = [np.load(f"{folder}/events_{k}.npy", mmap_mode="r" if mmap else None) for k in range(chunks)]
+    return np.concatenate(parts) if parts else np.empty(0, dtype=TRACE_DTYPE)
+
+
+def tricks_per_deck(events: np.ndarray, num_decks: int) -> np.ndarray:
+    """Game length (number of tricks played) of every deck"""
+    return np.bincount(events["deck"], minlength=num_decks)
+
+
+def first_disagreement(cards, p1: str, p2: str, aligned: bool = False, score_by_tricks: bool = True) -> dict | None:
+    """
+    Compare the per-deck results of `fastmatch.outcomes_for_pair` and `fastmatch_simd.outcomes_for_pair`
+    with the pure NumPy reference (what `Parser.winner2` counts).
+
+    Returns None when every kernel agrees, else the first deck where one differs, with each kernel's
+    (outcome, margin) for it and each kernel's trace of it:
+        {"deck": k, "outcomes": {kernel: (outcome, margin)}, "traces": {kernel: events}}
+    """
+    cards = _cards(cards)
+    encoded = Deck(cards).encoded()
+    results = {"npmatch": npmatch.outcomes_for_pair(encoded, p1, p2, aligned, score_by_tricks)}
+    for name, mod in kernels().items():
+        if name != "npmatch":
+            results[name] = mod.outcomes_for_pair(encoded, p1, p2, aligned, score_by_tricks)
+    ref_outcomes, ref_margins = results["npmatch"]
+    bad = [
+        np.flatnonzero((np.asarray(outcomes) != ref_outcomes) | (np.asarray(margins) != ref_margins))
+        for outcomes, margins in results.values()
+    ]
+    bad = [b[0] for b in bad if b.size]
+    if not bad:
+        return None
+    deck = int(min(bad))
+    return {
+        "deck": deck,
+        "outcomes": {name: (int(o[deck]), int(m[deck])) for name, (o, m) in results.items()},
+        "traces": {
+            name: trace_events(cards[deck : deck + 1], p1, p2, aligned, kernel=name, deck_offset=deck)
+            for name in kernels()
+        },
+    }
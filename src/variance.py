@@ -0,0 +1,135 @@
+from __future__ import annotations
+import numpy as np
+from src.decks import SAMPLING_MODES, run_counts
+from src.parallel import map_table_blocks
+
+try:
+    from src.fastmatch import outcomes_tables
+except Exception:
+    from src.npmatch import outcomes_tables
+
+# Variance of the win/loss/draw chances estimated from a deck set, for each `deck_gen` sampling mode.
+#
+#   iid         multinomial: p(1 - p) / N
+#   antithetic  decks 2i and 2i + 1 are a shuffle and its colour-inverted copy; the variance comes
+#               from the spread of per-pair totals, so negatively correlated pairs count for more
+#   stratified  decks are spread over run counts in proportion to their probability; only the
+#               spread within each run count is left: sum over r of N_r p_r (1 - p_r) / N^2
+#
+# Every mode keeps the plain estimate (count / N), only the error estimate changes.
+
+_OUTCOME_COLUMN = np.array([1, 2, 0], dtype=np.intp)  # per-deck outcome -1/0/1 -> loss/draw/win column
+
+
+def _check_sampling(sampling: str) -> None:
+    if sampling not in SAMPLING_MODES:
+        raise ValueError(f"Unknown sampling mode {sampling!r}, expected one of {SAMPLING_MODES}")
+
+
+def outcome_stats(outcomes: np.ndarray, sampling: str = "iid", runs: np.ndarray | None = None) -> np.ndarray:
+    """
+    Sufficient statistics of per-deck outcomes (1 p1 won, -1 p2 won, 0 draw, decks on the last axis).
+
+    Shaped (..., S, 3) over [p1 wins, p2 wins, draws]:
+        iid         S = 1, the counts
+        antithetic  S = 2, the counts, then the number of pairs where both decks ended that way
+        stratified  S = deck_size + 1, the counts for decks with r runs (`runs`, see `run_counts`)
+    Statistics of separate deck sets add up.
+    """
+    _check_sampling(sampling)
+    columns = _OUTCOME_COLUMN[np.asarray(outcomes, dtype=np.int64) + 1]
+    if sampling == "stratified":
+        if runs is None:
+            raise ValueError("Stratified statistics need the run count of every deck")
+        strata = int(runs.max(initial=0)) + 1
+        flat = columns.reshape(-1, columns.shape[-1])
+        stats = np.stack([np.bincount(runs * 3 + row, minlength=strata * 3) for row in flat])
+        return stats.reshape(columns.shape[:-1] + (strata, 3)).astype(np.int64)
+
+    counts = np.stack([np.count_nonzero(columns == col, axis=-1) for col in range(3)], axis=-1)
+    if sampling == "iid":
+        return counts[..., None, :].astype(np.int64)
+    if columns.shape[-1] % 2 == 1:
+        raise ValueError("Antithetic decks come in pairs, so the deck count must be even")
+    first, second = columns[..., 0::2], columns[..., 1::2]
+    both = np.stack([np.count_nonzero((first == col) & (second == col), axis=-1) for col in range(3)], axis=-1)
+    return np.stack((counts, both), axis=-2).astype(np.int64)
+
+
+def _pad_strata(x: np.ndarray, strata: int) -> np.ndarray:
+    return np.pad(x, [(0, 0)] * (x.ndim - 2) + [(0, strata - x.shape[-2]), (0, 0)])
+
+
+def add_stats(a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    """Combine statistics from two disjoint deck sets (stratified ones may cover different run counts)"""
+    strata = max(a.shape[-2], b.shape[-2])
+    return _pad_strata(a, strata) + _pad_strata(b, strata)
+
+
+def variance_from_stats(stats: np.ndarray, sampling: str = "iid") -> np.ndarray:
+    """Variance of the [win, loss, draw] chance estimates, shaped like the counts (..., 3)"""
+    _check_sampling(sampling)
+    stats = stats.astype(np.float64)
+    if sampling == "stratified":
+        counts = stats.sum(axis=-2)
+        n = counts.sum(axis=-1, keepdims=True)
+        n_r = stats.sum(axis=-1, keepdims=True)
+        p_r = stats / np.maximum(n_r, 1)
+        return (n_r * p_r * (1 - p_r)).sum(axis=-2) / np.maximum(n, 1) ** 2
+
+    counts = stats[..., 0, :]
+    n = counts.sum(axis=-1, keepdims=True)
+    p = counts / np.maximum(n, 1)
+    iid = p * (1 - p) / np.maximum(n, 1)
+    if sampling == "iid":
+        return iid
+    pairs = n / 2
+    # spread of Y = (outcome in deck 2i) + (outcome in deck 2i + 1), where sum(Y^2) = count + 2 * both
+    spread = (counts + 2 * stats[..., 1, :] - counts**2 / np.maximum(pairs, 1)) / np.maximum(pairs - 1, 1)
+    return np.where(pairs > 1, np.maximum(spread, 0) / np.maximum(4 * pairs, 1), iid)
+
+
+def score_stats_both(cards: np.ndarray, pairs: list, sampling: str = "iid", workers: int | None = None) -> np.ndarray:
+    """
+    Score every pair in `pairs` by tricks and by cards, keeping the statistics `sampling` needs.
+
+    Like `parser.score_counts_both`, each thread builds next-occurrence tables for a block of decks
+    (sized by `parallel.table_block`), but reads per-deck outcomes from them instead of totals.
+
+    Returns an int64 array shaped (2, pairs, S, 3), see `outcome_stats`.
+    """
+    _check_sampling(sampling)
+    cards = np.ascontiguousarray(cards, dtype=np.uint8)
+    bits = len(pairs[0][0]) if pairs else 3
+    if sampling == "antithetic" and len(cards) % 2 == 1:
+        raise ValueError("Antithetic decks come in pairs, so the deck count must be even")
+    runs = run_counts(cards) if sampling == "stratified" else None
+
+    def _score(tables, start):
+        outcomes = np.stack([outcomes_tables(tables, p1, p2) for p1, p2 in pairs], axis=1)
+        block_runs = None if runs is None else runs[start : start + len(tables)]
+        return outcome_stats(outcomes, sampling, block_runs)
+
+    strata = {"iid": 1, "antithetic": 2, "stratified": cards.shape[1] + 1}[sampling]
+    out = np.zeros((2, len(pairs), strata, 3), dtype=np.int64)
+    if len(cards) == 0 or not pairs:
+        return out
+    # even blocks keep antithetic pairs from straddling two blocks
+    results = map_table_blocks(_score, cards, bits, workers, even=True, name="penney-variance")
+    for stats in results:
+        out = add_stats(out, stats)
+    return out
+
+
+def score_with_variance(
+    cards: np.ndarray, pairs: list, sampling: str = "iid", workers: int | None = None
+) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Counts and their matching variance for decks made by `deck_gen(..., sampling=sampling)`.
+
+    Returns (counts, variance), both shaped (2, pairs, 3): by tricks, then by cards. `variance`
+    holds the variance of each [win, loss, draw] chance, ready for `ScoreTable(..., variance=...)`.
+    """
+    stats = score_stats_both(cards, pairs, sampling, workers)
+    counts = stats.sum(axis=-2) if sampling == "stratified" else stats[..., 0, :]
+    return counts, variance_from_stats(stats, sampling)